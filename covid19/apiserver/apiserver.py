@@ -6,17 +6,20 @@ import waitress
 from prometheus_flask_exporter import PrometheusMetrics
 
 from covid19.apiserver.covid19api import Covid19API
+from covid19.apiserver.responsecache import ResponseCache, make_etag
+from covid19.apiserver.encoder import encode, compress, collect
 from covid19.version import version
 from covid19.apiserver.configuration import print_configuration
 from covid19.pgconnectors.covid import CovidPGConnector
 
-from flask import Flask, request
+from flask import Flask, Response, request
 
 
 app = Flask("test")
 flask_metrics = PrometheusMetrics(app)
 flask_metrics.info('covid19api', 'Grafana API server for covid19mon data', version=version)
 g_covid19api = Covid19API()
+g_responses = ResponseCache()
 
 
 @app.route("/")
@@ -25,27 +28,63 @@ def index():
     return "OK"
 
 
+def json_response(body, etag, encoding=None):
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+
+def debug_enabled():
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
 @app.route("/search", methods=["POST"])
 def grafana_search():
     global g_covid19api
     targets = g_covid19api.targets
-    logging.debug(f'/search: {json.dumps(targets, indent=4, sort_keys=True)}')
-    return json.dumps(targets)
+    if debug_enabled():
+        logging.debug(f'/search: {json.dumps(targets, indent=4, sort_keys=True)}')
+    etag = make_etag(targets)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return json_response(json.dumps(targets), etag)
 
 
 @app.route("/query", methods=["POST"])
 def grafana_query():
-    global g_covid19api
+    global g_covid19api, g_responses
     req = request.get_json(force=True)
-    # max_data_points = req['maxDataPoints']
-    # interval = req['interval']
+    max_data_points = req.get('maxDataPoints')
+    interval = req.get('intervalMs')
     start_time = req['range']['from']
     end_time = req['range']['to']
     targets = [(entry['target'], entry['type']) for entry in req['targets']]
-    logging.info(f'/query - {targets} ({start_time}/{end_time}')
-    metrics = g_covid19api.get_data(targets, start_time, end_time)
-    logging.debug(f'/query: {json.dumps(metrics, indent=4, sort_keys=True)}')
-    return json.dumps(metrics)
+    logging.info(f'/query - {targets} ({start_time}/{end_time}, {max_data_points}/{interval})')
+    encoding = 'gzip' if 'gzip' in request.accept_encodings else None
+    version = g_covid19api.version()
+    key = (tuple(targets), start_time, end_time, max_data_points, interval, encoding)
+    etag = make_etag(key, version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    body = g_responses.get(key, version)
+    if body is None:
+        metrics = g_covid19api.get_data(targets, start_time, end_time, max_data_points, interval, refresh=False)
+        if debug_enabled():
+            logging.debug(f'/query: {json.dumps(metrics, indent=4, sort_keys=True)}')
+        chunks = encode(metrics)
+        if encoding:
+            chunks = compress(chunks)
+        body = collect(chunks, lambda content: g_responses.put(key, version, content))
+    return json_response(body, etag, encoding)
 
 
 def main(configuration):
@@ -54,10 +93,13 @@ def main(configuration):
                         level=logging.DEBUG if configuration.debug else logging.INFO)
     logging.info(f'Starting covid19api v{version}')
     logging.info(f'Configuration: {print_configuration(configuration)}')
+    g_covid19api.cache = not configuration.no_cache
+    g_covid19api.engine = configuration.engine
     g_covid19api.set_covidpg(CovidPGConnector(
         configuration.postgres_host, configuration.postgres_port,
         configuration.postgres_database,
-        configuration.postgres_user, configuration.postgres_password))
+        configuration.postgres_user, configuration.postgres_password,
+        configuration.postgres_pool_size))
     waitress.serve(app, host='0.0.0.0', port=configuration.port)  # nosec
 
 
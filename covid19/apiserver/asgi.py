@@ -0,0 +1,135 @@
+import json
+import logging
+import time
+import uvicorn
+from prometheus_client import Counter, Histogram, make_asgi_app
+
+from covid19.version import version
+from covid19.apiserver.configuration import print_configuration
+from covid19.apiserver.covid19api import AsyncCovid19API
+from covid19.apiserver.encoder import encode, compress, collect
+from covid19.apiserver.responsecache import ResponseCache, make_etag
+from covid19.pgconnectors.asynccovid import AsyncCovidPGConnector
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Duration of HTTP requests', ['method', 'path', 'status'])
+REQUEST_COUNT = Counter('http_request_total', 'Total number of HTTP requests', ['method', 'status'])
+
+
+def etag_matches(header, etag):
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or f'"{etag}"' in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+class GrafanaApp:
+    """
+    ASGI application serving the Grafana JSON datasource API (/, /search & /query) and Prometheus metrics.
+    """
+    def __init__(self, api, responses=None):
+        self.api = api
+        self.responses = responses if responses is not None else ResponseCache()
+        self.metrics = make_asgi_app()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['path'] == '/metrics':
+                await self.metrics(scope, receive, send)
+                return
+            start = time.monotonic()
+            status = await self._dispatch(scope, receive, send)
+            if scope['path'] != '/':
+                REQUEST_DURATION.labels(scope['method'], scope['path'], status).observe(time.monotonic() - start)
+                REQUEST_COUNT.labels(scope['method'], status).inc()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.api.covid19pg.connect()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.api.covid19pg.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, scope, receive, send):
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        route = (scope['method'], scope['path'])
+        if route == ('GET', '/'):
+            return await self._respond(send, 200, body=b'OK', content_type='text/plain')
+        if route == ('POST', '/search'):
+            return await self._search(headers, send)
+        if route == ('POST', '/query'):
+            return await self._query(json.loads(await self._read_body(receive)), headers, send)
+        return await self._respond(send, 404, body=b'Not Found', content_type='text/plain')
+
+    @staticmethod
+    async def _read_body(receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body', False):
+                return body
+
+    @staticmethod
+    async def _respond(send, status, body=b'', chunks=None, content_type='application/json', etag=None,
+                       encoding=None):
+        headers = [(b'content-type', content_type.encode())]
+        if etag:
+            headers.append((b'etag', f'"{etag}"'.encode()))
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode()))
+            headers.append((b'vary', b'Accept-Encoding'))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for chunk in chunks or []:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': body})
+        return status
+
+    async def _search(self, headers, send):
+        targets = self.api.targets
+        etag = make_etag(targets)
+        if etag_matches(headers.get('if-none-match', ''), etag):
+            return await self._respond(send, 304, etag=etag)
+        return await self._respond(send, 200, body=json.dumps(targets).encode(), etag=etag)
+
+    async def _query(self, req, headers, send):
+        max_data_points = req.get('maxDataPoints')
+        interval = req.get('intervalMs')
+        start_time = req['range']['from']
+        end_time = req['range']['to']
+        targets = [(entry['target'], entry['type']) for entry in req['targets']]
+        logging.info(f'/query - {targets} ({start_time}/{end_time}, {max_data_points}/{interval})')
+        encoding = 'gzip' if 'gzip' in headers.get('accept-encoding', '') else None
+        version = await self.api.version()
+        key = (tuple(targets), start_time, end_time, max_data_points, interval, encoding)
+        etag = make_etag(key, version)
+        if etag_matches(headers.get('if-none-match', ''), etag):
+            return await self._respond(send, 304, etag=etag)
+        body = self.responses.get(key, version)
+        if body is not None:
+            return await self._respond(send, 200, body=body, etag=etag, encoding=encoding)
+        metrics = await self.api.get_data(targets, start_time, end_time, max_data_points, interval, refresh=False)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f'/query: {json.dumps(metrics, indent=4, sort_keys=True)}')
+        chunks = encode(metrics)
+        if encoding:
+            chunks = compress(chunks)
+        chunks = collect(chunks, lambda content: self.responses.put(key, version, content))
+        return await self._respond(send, 200, chunks=chunks, etag=etag, encoding=encoding)
+
+
+def main(configuration):
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.DEBUG if configuration.debug else logging.INFO)
+    logging.info(f'Starting covid19api v{version} (asgi)')
+    logging.info(f'Configuration: {print_configuration(configuration)}')
+    api = AsyncCovid19API(cache=not configuration.no_cache, engine=configuration.engine)
+    api.set_covidpg(AsyncCovidPGConnector(
+        configuration.postgres_host, configuration.postgres_port,
+        configuration.postgres_database,
+        configuration.postgres_user, configuration.postgres_password,
+        max_size=configuration.postgres_pool_size))
+    uvicorn.run(GrafanaApp(api), host='0.0.0.0', port=configuration.port, log_level='warning')  # nosec
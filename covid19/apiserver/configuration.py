@@ -2,12 +2,15 @@ import argparse
 import copy
 
 from covid19.version import version
+from covid19.apiserver.series import engines
 
 
 def get_configuration(args=None):
     default_port = 8080
     default_pg_port = 5432
     default_pg_database = 'covid19'
+    default_pg_pool_size = 5
+    default_engine = 'python'
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--version', action='version', version=f'%(prog)s {version}')
@@ -15,6 +18,12 @@ def get_configuration(args=None):
                         help=f'API server port (default: {default_port})')
     parser.add_argument('--debug', action='store_true',
                         help='Set logging level to debug')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Query the database for every request instead of caching the daily series')
+    parser.add_argument('--engine', choices=engines.keys(), default=default_engine,
+                        help=f'Aggregation engine (default: {default_engine})')
+    parser.add_argument('--asgi', action='store_true',
+                        help='Serve through the asyncio (ASGI) server instead of waitress')
     parser.add_argument('--postgres-host',
                         help='Postgres DB host')
     parser.add_argument('--postgres-port', default=default_pg_port,
@@ -25,6 +34,8 @@ def get_configuration(args=None):
                         help='Postgres DB user name')
     parser.add_argument('--postgres-password',
                         help='Postgres DB password')
+    parser.add_argument('--postgres-pool-size', type=int, default=default_pg_pool_size,
+                        help=f'Maximum number of Postgres connections (default: {default_pg_pool_size})')
     return parser.parse_args(args)
 
 
@@ -1,28 +1,42 @@
+import asyncio
 import logging
 import re
-from datetime import datetime, date
+import threading
+from datetime import date
+
+from covid19.apiserver.series import engines, datetime_to_epoch, bucket_size, downsample
+from covid19.probes.countries import country_codes, regions
 
 
 class Covid19API:
-    def __init__(self):
+    def __init__(self, cache=True, engine='python'):
         self._targets = [
             'confirmed', 'confirmed-delta',
             'death', 'death-delta',
             'recovered', 'recovered-delta',
             'active', 'active-delta'
         ]
+        codes = set(country_codes.values())
+        self.regions = {region: frozenset(codes.intersection(members)) for region, members in regions.items()}
         self.covid19pg = None
+        self.cache = cache
+        self.engine = engine
+        self.series = engines[engine]()
+        self._lock = threading.Lock()
 
     @property
     def targets(self):
-        return self._targets
+        return self._targets + [
+            f'{target}:region={region}' for region in self.regions for target in self._targets
+        ]
 
     def set_covidpg(self, covidpg):
         self.covid19pg = covidpg
+        self.series = engines[self.engine]()
 
     @staticmethod
     def datetime_to_epoch(ts):
-        return int((datetime(ts.year, ts.month, ts.day) - datetime(1970, 1, 1)).total_seconds() * 1000)
+        return datetime_to_epoch(ts)
 
     @staticmethod
     def grafana_date_to_epoch(ts):
@@ -33,70 +47,126 @@ class Covid19API:
                 return Covid19API.datetime_to_epoch(date(int(m.group(1)), int(m.group(2)), int(m.group(3))))
         return 0
 
-    @staticmethod
-    def is_target(my_target, target_names):
-        for t in target_names:
-            if t[0] == my_target:
-                return True
-        return False
-
-    def get_data_by_time_country(self, end_time=None):
-        countries = set()
-        values = dict()
-        for entry in self.covid19pg.list(end_time=end_time):
-            time = Covid19API.datetime_to_epoch(entry[0])
-            code = entry[1]
-            confirmed = entry[3]
-            death = entry[4]
-            recovered = entry[5]
-            if time not in values:
-                values[time] = dict()
-            if code not in values[time]:
-                values[time][code] = {}
-            values[time][code] = {'confirmed': confirmed, 'death': death, 'recovered': recovered}
-            countries.add(code)
-        return values, countries
-
-    def get_data_by_time(self, values, countries, start_time):
-        metrics = dict()
-        current = dict()
-        for t in self.targets:
-            metrics[t] = {'target': t, 'datapoints': []}
-            current[t] = 0
-        last = {
-            'confirmed': {country: 0 for country in countries},
-            'death': {country: 0 for country in countries},
-            'recovered': {country: 0 for country in countries}
-        }
-        skip_time = Covid19API.grafana_date_to_epoch(start_time)
-        for time, time_data in values.items():
-            for country, data in time_data.items():
-                last['confirmed'][country] = data['confirmed']
-                last['death'][country] = data['death']
-                last['recovered'][country] = data['recovered']
-            previous = current
-            current = dict()
-            current['confirmed'] = sum(last['confirmed'].values())
-            current['death'] = sum(last['death'].values())
-            current['recovered'] = sum(last['recovered'].values())
-            current['active'] = current['confirmed'] - current['death'] - current['recovered']
-            if time < skip_time:
-                continue
-            for t in self.targets:
-                if t.endswith('-delta'):
-                    pass
-                else:
-                    metrics[t]['datapoints'].append([current[t], time])
-                    metrics[f'{t}-delta']['datapoints'].append([current[t] - previous[t], time])
-        return metrics
-
-    def get_data(self, targets, start_time=None, end_time=None):
-        # TODO: support table output: https://grafana.com/grafana/plugins/simpod-json-datasource#query
-        logging.debug(f'{start_time} {end_time}')
-        values, countries = self.get_data_by_time_country(end_time)
-        metrics = self.get_data_by_time(values, countries, start_time)
+    def parse_target(self, target):
+        # 'confirmed' (world), 'confirmed:BE' (country) or 'confirmed:region=EU' (region)
+        name, _, selector = target.partition(':')
+        if name not in self._targets:
+            return None
+        if not selector:
+            return name, None
+        if selector.startswith('region='):
+            region = selector[len('region='):]
+            return (name, self.regions[region]) if region in self.regions else None
+        return name, (selector,)
+
+    def _fold(self, rows):
+        if rows:
+            logging.debug(f'folding {len(rows)} new records')
+            self.series.fold(rows)
+
+    def _update(self):
+        # only fetch what was added since the last call and fold it into the resident series
+        watermark = self.series.watermark
+        if self.series.rollup:
+            totals = self.covid19pg.list_totals(since=watermark)
+            self._fold(self.covid19pg.list_rollup(since=watermark))
+            self.series.fold_totals(totals)
+        elif watermark is None:
+            self._fold(self.covid19pg.list_daily())
+        else:
+            self._fold(self.covid19pg.list(start_time=watermark))
+
+    def _load(self, start_time, end_time):
+        series = engines[self.engine]()
+        if series.rollup:
+            series.fold(self.covid19pg.list_rollup(start_time, end_time))
+            series.fold_totals(self.covid19pg.list_totals(start_time, end_time))
+        else:
+            series.fold(self.covid19pg.list_daily(start_time, end_time))
+        return series
+
+    def _get_data(self, series, targets, start_time, end_time, max_data_points, interval):
+        first, last = series.span(
+            Covid19API.grafana_date_to_epoch(start_time),
+            Covid19API.grafana_date_to_epoch(end_time)
+        )
         output = []
-        for target in self.targets:
-            if Covid19API.is_target(target, targets):
-                output.append(metrics[target])
+        for target in dict.fromkeys(target for target, _ in targets):
+            parsed = self.parse_target(target)
+            if parsed is None:
+                logging.warning(f'Unsupported target: {target}')
+                continue
+            name, codes = parsed
+            datapoints = series.datapoints(name, first, last, codes)
+            size = bucket_size(datapoints, max_data_points, interval)
+            datapoints = downsample(datapoints, size, name.endswith('-delta'))
+            output.append({'target': target, 'datapoints': datapoints})
         return output
+
+    def version(self):
+        # the time of the most recent record. Changes whenever new data is added
+        if not self.cache:
+            return self.covid19pg.get_latest_time()
+        with self._lock:
+            self._update()
+            return self.series.watermark
+
+    def get_data(self, targets, start_time=None, end_time=None, max_data_points=None, interval=None, refresh=True):
+        # TODO: support table output: https://grafana.com/grafana/plugins/simpod-json-datasource#query
+        logging.debug(f'{start_time} {end_time} {max_data_points} {interval}')
+        if not self.cache:
+            series = self._load(start_time, end_time)
+            return self._get_data(series, targets, start_time, end_time, max_data_points, interval)
+        with self._lock:
+            if refresh:
+                self._update()
+            return self._get_data(self.series, targets, start_time, end_time, max_data_points, interval)
+
+
+class AsyncCovid19API(Covid19API):
+    """
+    Covid19API for asyncio servers. Reads go through an async connector (see AsyncCovidPGConnector);
+    the series, targets and output format are shared with Covid19API.
+    """
+    def __init__(self, cache=True, engine='python'):
+        super().__init__(cache, engine)
+        self._update_lock = None
+
+    async def _update_async(self):
+        if self._update_lock is None:
+            self._update_lock = asyncio.Lock()
+        async with self._update_lock:
+            watermark = self.series.watermark
+            if self.series.rollup:
+                totals = await self.covid19pg.list_totals(since=watermark)
+                self._fold(await self.covid19pg.list_rollup(since=watermark))
+                self.series.fold_totals(totals)
+            elif watermark is None:
+                self._fold(await self.covid19pg.list_daily())
+            else:
+                self._fold(await self.covid19pg.list(start_time=watermark))
+
+    async def _load_async(self, start_time, end_time):
+        series = engines[self.engine]()
+        if series.rollup:
+            series.fold(await self.covid19pg.list_rollup(start_time, end_time))
+            series.fold_totals(await self.covid19pg.list_totals(start_time, end_time))
+        else:
+            series.fold(await self.covid19pg.list_daily(start_time, end_time))
+        return series
+
+    async def version(self):
+        if not self.cache:
+            return await self.covid19pg.get_latest_time()
+        await self._update_async()
+        return self.series.watermark
+
+    async def get_data(self, targets, start_time=None, end_time=None, max_data_points=None, interval=None,
+                       refresh=True):
+        logging.debug(f'{start_time} {end_time} {max_data_points} {interval}')
+        if not self.cache:
+            series = await self._load_async(start_time, end_time)
+            return self._get_data(series, targets, start_time, end_time, max_data_points, interval)
+        if refresh:
+            await self._update_async()
+        return self._get_data(self.series, targets, start_time, end_time, max_data_points, interval)
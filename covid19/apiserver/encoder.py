@@ -0,0 +1,42 @@
+import json
+import zlib
+from itertools import islice
+
+
+def encode(metrics, chunk_size=500):
+    """
+    Encode a list of Grafana targets as JSON, one chunk at a time.
+
+    The concatenated output matches json.dumps(metrics). Datapoints may be given as a list or any iterable.
+    """
+    yield b'['
+    for index, metric in enumerate(metrics):
+        yield f'{", " if index else ""}{{"target": {json.dumps(metric["target"])}, "datapoints": ['.encode()
+        datapoints = iter(metric['datapoints'])
+        separator = ''
+        while True:
+            chunk = list(islice(datapoints, chunk_size))
+            if not chunk:
+                break
+            yield f'{separator}{json.dumps(chunk)[1:-1]}'.encode()
+            separator = ', '
+        yield b']}'
+    yield b']'
+
+
+def compress(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def collect(chunks, callback):
+    # pass the chunks through, then hand the full body to callback
+    collected = []
+    for chunk in chunks:
+        collected.append(chunk)
+        yield chunk
+    callback(b''.join(collected))
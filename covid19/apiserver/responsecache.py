@@ -0,0 +1,45 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_etag(*args):
+    return hashlib.sha1(repr(args).encode()).hexdigest()  # nosec
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized responses, tied to a data version.
+
+    Entries are only valid for the version they were created for: the first lookup for a new version
+    clears the cache.
+    """
+    def __init__(self, size=64):
+        self._size = size
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,298 @@
+import bisect
+import logging
+from datetime import date
+import numpy as np
+
+
+EPOCH = date(1970, 1, 1).toordinal()
+DAY = 86400000
+
+
+def datetime_to_epoch(ts):
+    return (ts.toordinal() - EPOCH) * DAY
+
+
+def bucket_size(datapoints, max_data_points=None, interval=None):
+    # Grafana's interval is a hint; maxDataPoints is a hard limit
+    size = interval or 0
+    if max_data_points and datapoints:
+        span = datapoints[-1][1] - datapoints[0][1] + DAY
+        size = max(size, -(-span // max_data_points))
+    return size
+
+
+def downsample(datapoints, size, summed=False):
+    # buckets are aligned on the first datapoint. Each bucket reports the time of its last datapoint and
+    # either the last value (cumulative series) or the sum of its values (delta series)
+    if size <= DAY or not datapoints:
+        return datapoints
+    origin = datapoints[0][1]
+    output, current = [], None
+    for value, time in datapoints:
+        bucket = (time - origin) // size
+        if bucket != current:
+            output.append([value, time])
+            current = bucket
+        else:
+            output[-1] = [output[-1][0] + value if summed else value, time]
+    return output
+
+
+def _datapoints(values, days, delta, carried):
+    # values holds one extra leading entry when carried is set, so the first delta is relative to the previous day
+    if delta:
+        values = np.diff(values) if carried else np.diff(values, prepend=0)
+    elif carried:
+        values = values[1:]
+    return [[value, time] for value, time in zip(values.tolist(), days.tolist())]
+
+
+class CountrySeries:
+    """
+    Sorted daily values (confirmed, death, recovered) reported by a single country.
+    """
+    def __init__(self):
+        self.days = []
+        self.values = []
+        self._arrays = None
+
+    def add(self, day, values):
+        if self.days and self.days[-1] == day:
+            self.values[-1] = values
+        else:
+            self.days.append(day)
+            self.values.append(values)
+        self._arrays = None
+
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.array(self.days, dtype=np.int64),
+                np.array(self.values, dtype=float).reshape(-1, len(DailySeries.metrics))
+            )
+        return self._arrays
+
+    def align(self, days):
+        # forward-fill the country's values onto the requested days. Days before the first report count as zero
+        own_days, values = self.arrays()
+        index = np.searchsorted(own_days, days, side='right') - 1
+        aligned = values[np.maximum(index, 0)] if len(values) else np.zeros((len(days), values.shape[1]))
+        aligned[index < 0] = 0
+        return aligned
+
+
+class DailySeries:
+    """
+    Resident per-day world totals, built incrementally from covid19 rows.
+
+    Rows are folded in as they arrive (ordered by time). The series keeps the last reported value of each country,
+    so new rows only adjust the running totals of the day they fall in. Ranges are resolved by binary search
+    over the day index.
+
+    Each country's own series is kept in an index, so country and region targets are answered by aligning
+    the member series on the day index and adding them up.
+    """
+    metrics = ('confirmed', 'death', 'recovered')
+    rollup = False
+
+    def __init__(self):
+        self.watermark = None
+        self.days = []
+        self.totals = {metric: [] for metric in self.metrics}
+        self.last = {metric: dict() for metric in self.metrics}
+        self.index = dict()
+
+    def _add_to_index(self, code, day, values):
+        if code not in self.index:
+            self.index[code] = CountrySeries()
+        self.index[code].add(day, tuple(values))
+
+    def fold(self, rows):
+        for entry in rows or []:
+            time = datetime_to_epoch(entry[0])
+            if self.days and time < self.days[-1]:
+                logging.warning(f'Skipping out-of-order entry for {entry[1]} at {entry[0]}')
+                continue
+            if not self.days or time > self.days[-1]:
+                self.days.append(time)
+                for metric in self.metrics:
+                    totals = self.totals[metric]
+                    totals.append(totals[-1] if totals else 0)
+            code = entry[1]
+            for metric, value in zip(self.metrics, entry[3:6]):
+                self.totals[metric][-1] += value - self.last[metric].get(code, 0)
+                self.last[metric][code] = value
+            self._add_to_index(code, time, entry[3:6])
+            self.watermark = entry[0]
+
+    def span(self, start=None, end=None):
+        first = bisect.bisect_left(self.days, start) if start else 0
+        last = bisect.bisect_right(self.days, end) if end else len(self.days)
+        return first, last
+
+    def values(self, metric, first, last):
+        if metric == 'active':
+            return [
+                confirmed - death - recovered
+                for confirmed, death, recovered in zip(
+                    self.totals['confirmed'][first:last],
+                    self.totals['death'][first:last],
+                    self.totals['recovered'][first:last])
+            ]
+        return self.totals[metric][first:last]
+
+    def member_values(self, metric, codes, first, last):
+        days = np.asarray(self.days[first:last], dtype=np.int64)
+        totals = np.zeros((len(days), len(self.metrics)))
+        for code in codes:
+            if code in self.index:
+                totals += self.index[code].align(days)
+        if metric == 'active':
+            return totals[:, 0] - totals[:, 1] - totals[:, 2]
+        return totals[:, self.metrics.index(metric)]
+
+    def datapoints(self, target, first, last, codes=None):
+        if first >= last:
+            return []
+        if codes is not None:
+            delta = target.endswith('-delta')
+            metric = target[:-len('-delta')] if delta else target
+            start = first - 1 if first > 0 else first
+            values = self.member_values(metric, codes, start, last)
+            return _datapoints(values, np.asarray(self.days[first:last]), delta, start < first)
+        if target.endswith('-delta'):
+            metric = target[:-len('-delta')]
+            start = max(first - 1, 0)
+            values = self.values(metric, start, last)
+            previous = values[0] if first > 0 else 0
+            values = values[first - start:]
+            output = []
+            for time, value in zip(self.days[first:last], values):
+                output.append([value - previous, time])
+                previous = value
+            return output
+        return [[value, time] for time, value in zip(self.days[first:last], self.values(target, first, last))]
+
+
+class NumpyDailySeries(DailySeries):
+    """
+    DailySeries variant that folds rows with vectorized operations.
+
+    Rows are loaded into columnar arrays (day index, country index, values). Values are forward-filled per country
+    over the days, starting from the last known value of each country, and summed per day.
+    """
+    def __init__(self):
+        self.watermark = None
+        self.days = np.empty(0, dtype=np.int64)
+        self.totals = np.empty((0, len(self.metrics)))
+        self.countries = dict()
+        self._last = np.zeros((0, len(self.metrics)))
+        self.index = dict()
+
+    def _country_index(self, codes):
+        for code in codes:
+            if code not in self.countries:
+                self.countries[code] = len(self.countries)
+        if len(self.countries) > len(self._last):
+            self._last = np.vstack([self._last, np.zeros((len(self.countries) - len(self._last), len(self.metrics)))])
+        return np.fromiter((self.countries[code] for code in codes), dtype=np.int64, count=len(codes))
+
+    def fold(self, rows):
+        if not rows:
+            return
+        days = np.fromiter((datetime_to_epoch(entry[0]) for entry in rows), dtype=np.int64, count=len(rows))
+        keep = np.ones(len(rows), dtype=bool)
+        if len(self.days):
+            keep = days >= self.days[-1]
+            for entry in [rows[i] for i in np.flatnonzero(~keep)]:
+                logging.warning(f'Skipping out-of-order entry for {entry[1]} at {entry[0]}')
+            if not keep.any():
+                return
+        rows = [rows[i] for i in np.flatnonzero(keep)]
+        days = days[keep]
+        for day, entry in zip(days.tolist(), rows):
+            self._add_to_index(entry[1], day, entry[3:6])
+        countries = self._country_index([entry[1] for entry in rows])
+        values = np.array([entry[3:6] for entry in rows], dtype=float)
+        new_days, day_index = np.unique(days, return_inverse=True)
+        # several entries for the same country on the same day: the last one wins
+        positions = day_index * len(self.countries) + countries
+        _, reversed_index = np.unique(positions[::-1], return_index=True)
+        selected = len(positions) - 1 - reversed_index
+        # row 0 holds the values carried in from previous folds
+        grid = np.full((len(new_days) + 1, len(self.countries), len(self.metrics)), np.nan)
+        grid[0] = self._last
+        grid[day_index[selected] + 1, countries[selected]] = values[selected]
+        # forward fill: for each day & country, take the last day that has a value
+        reported = ~np.isnan(grid[:, :, 0])
+        fill = np.where(reported, np.arange(len(grid))[:, None], 0)
+        np.maximum.accumulate(fill, axis=0, out=fill)
+        grid = grid[fill, np.arange(len(self.countries))[None, :]]
+        totals = grid[1:].sum(axis=1)
+        if len(self.days) and new_days[0] == self.days[-1]:
+            self.totals[-1] = totals[0]
+            new_days, totals = new_days[1:], totals[1:]
+        self.days = np.concatenate([self.days, new_days])
+        self.totals = np.concatenate([self.totals, totals])
+        self._last = grid[-1]
+        self.watermark = rows[-1][0]
+
+    def span(self, start=None, end=None):
+        first = int(np.searchsorted(self.days, start, side='left')) if start else 0
+        last = int(np.searchsorted(self.days, end, side='right')) if end else len(self.days)
+        return first, last
+
+    def values(self, metric, first, last):
+        totals = self.totals[first:last]
+        if metric == 'active':
+            return totals[:, 0] - totals[:, 1] - totals[:, 2]
+        return totals[:, self.metrics.index(metric)]
+
+    def datapoints(self, target, first, last, codes=None):
+        if first >= last or codes is not None:
+            return super().datapoints(target, first, last, codes)
+        delta = target.endswith('-delta')
+        start = first - 1 if delta and first > 0 else first
+        values = self.values(target[:-len('-delta')] if delta else target, start, last)
+        return _datapoints(values, self.days[first:last], delta, start < first)
+
+
+class RollupSeries(DailySeries):
+    """
+    DailySeries read from the rollup tables maintained by CovidPGConnector.addmany.
+
+    World totals are taken as-is from covid19_daily_totals (fold_totals). Rows from covid19_daily only feed the
+    per-country index, so nothing is forward-filled when folding.
+    """
+    rollup = True
+
+    def fold(self, rows):
+        for entry in rows or []:
+            day = datetime_to_epoch(entry[0])
+            code = entry[1]
+            if code in self.index and day < self.index[code].days[-1]:
+                logging.warning(f'Skipping out-of-order entry for {code} at {entry[0]}')
+                continue
+            self._add_to_index(code, day, entry[3:6])
+            if self.watermark is None or entry[0] > self.watermark:
+                self.watermark = entry[0]
+
+    def fold_totals(self, rows):
+        for entry in rows or []:
+            day = datetime_to_epoch(entry[0])
+            # days before the last resident day are already known
+            if self.days and day < self.days[-1]:
+                continue
+            if not self.days or day > self.days[-1]:
+                self.days.append(day)
+                for metric in self.metrics:
+                    self.totals[metric].append(0)
+            for metric, value in zip(self.metrics, entry[1:4]):
+                self.totals[metric][-1] = value
+
+
+engines = {
+    'python': DailySeries,
+    'numpy': NumpyDailySeries,
+    'rollup': RollupSeries,
+}
@@ -2,6 +2,7 @@ import argparse
 import copy
 
 from covid19.version import version
+from covid19.probes.http import DEFAULT_TIMEOUT
 
 
 def get_configuration(args=None):
@@ -9,6 +10,8 @@ def get_configuration(args=None):
     default_port = 8080
     default_pg_port = 5432
     default_pg_database = 'covid19'
+    default_pg_pool_size = 5
+    default_connect_timeout, default_read_timeout = DEFAULT_TIMEOUT
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--version', action='version', version=f'%(prog)s {version}')
@@ -20,8 +23,14 @@ def get_configuration(args=None):
                         help='Set logging level to debug')
     parser.add_argument('--once', action='store_true',
                         help='Measure once and then terminate')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='Run probes concurrently, each with a timeout of its own interval')
     parser.add_argument('--apikey',
                         help='API Key')
+    parser.add_argument('--connect-timeout', type=float, default=default_connect_timeout,
+                        help=f'Timeout connecting to the APIs (default: {default_connect_timeout} sec)')
+    parser.add_argument('--read-timeout', type=float, default=default_read_timeout,
+                        help=f'Timeout reading from the APIs (default: {default_read_timeout} sec)')
     parser.add_argument('--postgres-host',
                         help='Postgres DB host')
     parser.add_argument('--postgres-port', default=default_pg_port,
@@ -32,6 +41,10 @@ def get_configuration(args=None):
                         help='Postgres DB user name')
     parser.add_argument('--postgres-password',
                         help='Postgres DB password')
+    parser.add_argument('--postgres-pool-size', type=int, default=default_pg_pool_size,
+                        help=f'Maximum number of Postgres connections (default: {default_pg_pool_size})')
+    parser.add_argument('--postgres-partitioned', action='store_true',
+                        help='Partition the covid19 table by month (migrates existing data)')
     parser.add_argument('--pushgateway',
                         help='URL of Prometheus pushgateway server')
     return parser.parse_args(args)
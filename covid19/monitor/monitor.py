@@ -3,6 +3,7 @@ from prometheus_client import start_http_server
 from pimetrics.scheduler import Scheduler
 from covid19.version import version
 from covid19.monitor.configuration import print_configuration
+from covid19.monitor.scheduler import ConcurrentScheduler
 from covid19.probes.population import PopulationProbe
 from covid19.pgconnectors.population import PopulationPGConnector
 from covid19.probes.covid import CovidCountryProbe, CovidLastUpdateProbe
@@ -10,7 +11,8 @@ from covid19.pgconnectors.covid import CovidPGConnector
 
 
 def initialise(configuration):
-    scheduler = Scheduler()
+    scheduler = ConcurrentScheduler() if configuration.concurrent else Scheduler()
+    timeout = (configuration.connect_timeout, configuration.read_timeout)
 
     if configuration.postgres_host:
         populationconn = PopulationPGConnector(
@@ -18,25 +20,28 @@ def initialise(configuration):
             port=configuration.postgres_port,
             database=configuration.postgres_database,
             user=configuration.postgres_user,
-            password=configuration.postgres_password
+            password=configuration.postgres_password,
+            pool_size=configuration.postgres_pool_size
         )
-        scheduler.register(PopulationProbe(configuration.apikey, populationconn), 60 * 60 * 24)
+        scheduler.register(PopulationProbe(configuration.apikey, populationconn, timeout), 60 * 60 * 24)
 
         covidconn = CovidPGConnector(
             host=configuration.postgres_host,
             port=configuration.postgres_port,
             database=configuration.postgres_database,
             user=configuration.postgres_user,
-            password=configuration.postgres_password
+            password=configuration.postgres_password,
+            pool_size=configuration.postgres_pool_size,
+            partitioned=configuration.postgres_partitioned
         )
     else:
         covidconn = None
 
+    # /v1/stats is only fetched when /v1/total reports new data
     scheduler.register(
-        CovidCountryProbe(configuration.apikey, covidconn, configuration.pushgateway), configuration.interval
-    )
-    scheduler.register(
-        CovidLastUpdateProbe(configuration.apikey), configuration.interval
+        CovidCountryProbe(configuration.apikey, covidconn, configuration.pushgateway,
+                          last_update=CovidLastUpdateProbe(configuration.apikey, timeout), timeout=timeout),
+        configuration.interval
     )
 
     return scheduler
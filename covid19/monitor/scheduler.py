@@ -0,0 +1,103 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from prometheus_client import Summary, Counter
+
+PROBE_DURATION = Summary('probe_run_duration_seconds', 'Time spent running a probe', ['probe'])
+PROBE_OVERRUNS = Counter('probe_overruns_total', 'Number of probe runs that exceeded their timeout', ['probe'])
+PROBE_SKIPPED = Counter('probe_skipped_runs_total', 'Number of probe runs skipped as the previous run was still busy',
+                        ['probe'])
+
+
+class _ScheduledProbe:
+    def __init__(self, probe, interval, timeout):
+        self.probe = probe
+        self.name = probe.__class__.__name__
+        self.interval = interval
+        self.timeout = timeout
+        self.next_run = None
+        self.deadline = None
+        self.future = None
+        self.overrun = False
+
+    def should_run(self, now):
+        return self.next_run is None or self.next_run <= now
+
+    @property
+    def busy(self):
+        return self.future is not None and not self.future.done()
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            self.probe.run()
+        except Exception as error:
+            logging.error(f'{self.name} failed: {error}')
+        finally:
+            PROBE_DURATION.labels(self.name).observe(time.monotonic() - start)
+
+
+class ConcurrentScheduler:
+    """
+    Drop-in alternative for pimetrics' Scheduler that runs due probes concurrently on a thread pool.
+
+    Each probe gets a timeout (by default, its interval). A run that takes longer is reported as an overrun
+    but can't be interrupted: the probe is simply not started again until that run finishes.
+    """
+    def __init__(self, workers=4):
+        self.scheduled_items = []
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+
+    def register(self, probe, interval=5, timeout=None):
+        self.scheduled_items.append(_ScheduledProbe(probe, interval, timeout if timeout else interval))
+
+    def _start(self, item, now):
+        item.next_run = now + item.interval
+        if item.busy:
+            logging.warning(f'{item.name} still running. Skipping this run')
+            PROBE_SKIPPED.labels(item.name).inc()
+            return
+        item.deadline = now + item.timeout
+        item.overrun = False
+        item.future = self.executor.submit(item.run)
+
+    def _check_deadlines(self, now):
+        for item in self.scheduled_items:
+            if item.busy and not item.overrun and now >= item.deadline:
+                logging.warning(f'{item.name} exceeded its timeout of {item.timeout} sec')
+                PROBE_OVERRUNS.labels(item.name).inc()
+                item.overrun = True
+
+    def _next_event(self):
+        # earliest time a probe is due or a running probe reaches its deadline
+        events = [item.next_run for item in self.scheduled_items if item.next_run is not None]
+        events += [item.deadline for item in self.scheduled_items if item.busy and not item.overrun]
+        return min(events) if events else None
+
+    def run(self, once=False, duration=5):
+        """
+        Run all registered probes
+
+        :param once: Run all probes only once (regardless of their specified interval) and wait for them
+        :param duration: How long we should run all required probes
+        """
+        end_time = time.time() + duration
+        while True:
+            now = time.time()
+            for item in self.scheduled_items:
+                if once or item.should_run(now):
+                    self._start(item, now)
+            if once:
+                running = [item for item in self.scheduled_items if item.busy]
+                if running:
+                    wait([item.future for item in running],
+                         timeout=max(item.deadline for item in running) - time.time())
+                self._check_deadlines(time.time())
+                break
+            self._check_deadlines(now)
+            if end_time and now >= end_time:
+                break
+            next_event = self._next_event()
+            period = min(next_event, end_time) - time.time() if next_event else end_time - time.time()
+            if period > 0:
+                time.sleep(period)
@@ -0,0 +1,132 @@
+import logging
+import asyncpg
+
+
+class AsyncCovidPGConnector:
+    """
+    Read-only access to the covid19 table for asyncio servers, through an asyncpg connection pool.
+
+    Mirrors the query methods of CovidPGConnector. The table itself is managed by CovidPGConnector.
+    """
+    def __init__(self, host, port, database, user, password, min_size=1, max_size=10):
+        self.host = host
+        self.port = port
+        self.database = database
+        self.user = user
+        self.password = password
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+
+    async def connect(self):
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                host=self.host,
+                port=int(self.port) if self.port else None,
+                database=self.database,
+                user=self.user,
+                password=self.password,
+                min_size=self.min_size,
+                max_size=self.max_size
+            )
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _fetch(self, query, *args):
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                return [tuple(row) for row in await conn.fetch(query, *args)]
+        except (OSError, asyncpg.PostgresError) as error:
+            logging.critical(f'Failed to get data: {error}')
+        return None
+
+    async def list(self, end_time=None, start_time=None):
+        # timestamps are passed as text, so both Grafana strings and datetimes are accepted
+        conditions, args = [], []
+        if start_time:
+            args.append(str(start_time))
+            conditions.append(f'time > ${len(args)}::text::timestamptz')
+        if end_time:
+            args.append(str(end_time))
+            conditions.append(f'time < ${len(args)}::text::timestamptz')
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        return await self._fetch(f"""
+            SELECT time, country_code, country_name, confirmed, death, recovered FROM covid19
+                {where} ORDER BY time, country_code
+        """, *args)  # nosec
+
+    async def list_daily(self, start_time=None, end_time=None):
+        conditions, args = [], []
+        if start_time:
+            args.append(str(start_time))
+            start = f'date_trunc(\'day\', ${len(args)}::text::timestamptz)'
+            conditions.append(f'time >= {start}')
+        if end_time:
+            args.append(str(end_time))
+            conditions.append(f'time < date_trunc(\'day\', ${len(args)}::text::timestamptz) + interval \'1 day\'')
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        query = f"""
+            (SELECT DISTINCT ON (country_code, date_trunc('day', time))
+                time, country_code, country_name, confirmed, death, recovered FROM covid19
+                {where} ORDER BY country_code, date_trunc('day', time), time DESC)
+        """
+        if start_time:
+            query = f"""
+                (SELECT DISTINCT ON (country_code)
+                    time, country_code, country_name, confirmed, death, recovered FROM covid19
+                    WHERE time < {start} ORDER BY country_code, time DESC)
+                UNION ALL {query}
+            """
+        return await self._fetch(f'SELECT * FROM ({query}) AS daily ORDER BY time', *args)  # nosec
+
+    async def list_rollup(self, start_time=None, end_time=None, since=None):
+        conditions, args = [], []
+        if since:
+            args.append(str(since))
+            conditions.append(f'time > ${len(args)}::text::timestamptz')
+        if start_time:
+            args.append(str(start_time))
+            start = f'${len(args)}::text::timestamptz::date'
+            conditions.append(f'day >= {start}')
+        if end_time:
+            args.append(str(end_time))
+            conditions.append(f'day <= ${len(args)}::text::timestamptz::date')
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        query = f"""
+            (SELECT time, country_code, country_name, confirmed, death, recovered FROM covid19_daily {where})
+        """
+        if start_time and not since:
+            query = f"""
+                (SELECT DISTINCT ON (country_code)
+                    time, country_code, country_name, confirmed, death, recovered FROM covid19_daily
+                    WHERE day < {start} ORDER BY country_code, day DESC)
+                UNION ALL {query}
+            """
+        return await self._fetch(f'SELECT * FROM ({query}) AS daily ORDER BY time', *args)  # nosec
+
+    async def list_totals(self, start_time=None, end_time=None, since=None):
+        conditions, args = [], []
+        if since:
+            args.append(str(since))
+            conditions.append(f'day >= ${len(args)}::text::timestamptz::date')
+        if start_time:
+            args.append(str(start_time))
+            start = f'${len(args)}::text::timestamptz::date'
+            conditions.append(f"""day >= coalesce((SELECT max(day) FROM covid19_daily_totals
+                WHERE day < {start}), {start})""")
+        if end_time:
+            args.append(str(end_time))
+            conditions.append(f'day <= ${len(args)}::text::timestamptz::date')
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        return await self._fetch(f"""
+            SELECT day, confirmed, death, recovered FROM covid19_daily_totals {where} ORDER BY day
+        """, *args)  # nosec
+
+    async def get_latest_time(self):
+        rows = await self._fetch('SELECT max(time) FROM covid19')
+        return rows[0][0] if rows else None
@@ -1,14 +1,44 @@
-from datetime import datetime
+from datetime import datetime, date
+import csv
+import io
 import logging
+import pytz
 import psycopg2
+import psycopg2.errors
+import psycopg2.extras
 from covid19.pgconnectors.pgconnector import PostgresConnector
 
 
+def _month(time):
+    # first day of the (UTC) month holding time. Naive timestamps are taken to be in UTC
+    if time.tzinfo:
+        time = time.astimezone(pytz.UTC)
+    return date(time.year, time.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
 class CovidPGConnector(PostgresConnector):
-    def __init__(self, host, port, database, user, password):
-        super().__init__(host, port, database, user, password)
+    """
+    Stores covid19 records.
+
+    With partitioned set, covid19 is range-partitioned by month (partitions are added as data arrives),
+    with a BRIN index on time and a (country_name, time) index. An existing unpartitioned covid19 table
+    is migrated the first time the connector is used.
+
+    addmany also maintains a daily rollup, in the same transaction: covid19_daily holds the last record per country
+    per day and covid19_daily_totals the world totals per day (countries that didn't report carry their last value).
+    """
+    def __init__(self, host, port, database, user, password, pool_size=5, partitioned=False):
+        super().__init__(host, port, database, user, password, pool_size)
         self.first = True
         self.reported = {}
+        self.partitioned = partitioned
+        self.unique = False
+        self._partitions = set()
+        self._last_updated = None
 
     def _init_db(self):
         super()._init_db()
@@ -18,26 +48,213 @@ class CovidPGConnector(PostgresConnector):
         try:
             conn = self.connect()
             curr = conn.cursor()
+            if self.partitioned:
+                if self._is_heap(curr):
+                    self._migrate(curr)
+                else:
+                    self._create_partitioned(curr)
+            else:
+                curr.execute("""
+                    CREATE TABLE IF NOT EXISTS covid19 (
+                    time TIMESTAMPTZ,
+                    country_code TEXT,
+                    country_name TEXT,
+                    confirmed DOUBLE PRECISION,
+                    death DOUBLE PRECISION,
+                    recovered DOUBLE PRECISION
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_covid_country_name ON covid19(country_name);
+                    CREATE INDEX IF NOT EXISTS idx_covid_country_code ON covid19(country_code);
+                    CREATE INDEX IF NOT EXISTS idx_covid_time ON covid19(time);
+                """)
+            self._add_key(curr)
             curr.execute("""
-                CREATE TABLE IF NOT EXISTS covid19 (
-                time TIMESTAMPTZ,
-                country_code TEXT,
-                country_name TEXT,
-                confirmed DOUBLE PRECISION,
-                death DOUBLE PRECISION,
-                recovered DOUBLE PRECISION
+                CREATE TABLE IF NOT EXISTS covid19_latest (
+                country_name TEXT PRIMARY KEY,
+                time TIMESTAMPTZ
                 );
-                CREATE INDEX IF NOT EXISTS idx_covid_country_name ON covid19(country_name);
-                CREATE INDEX IF NOT EXISTS idx_covid_country_code ON covid19(country_code);
-                CREATE INDEX IF NOT EXISTS idx_covid_time ON covid19(time);
             """)
+            # first run with covid19_latest: fill it from the existing data
+            curr.execute("""
+                INSERT INTO covid19_latest(country_name, time)
+                    SELECT country_name, max(time) FROM covid19
+                    WHERE NOT EXISTS (SELECT 1 FROM covid19_latest) GROUP BY country_name
+            """)
+            self._build_rollup(curr)
             curr.close()
             conn.commit()
         except (Exception, psycopg2.DatabaseError) as error:
             logging.critical(f'Failed to create covid19 table: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
+
+    def _build_rollup(self, curr):
+        curr.execute("""
+            CREATE TABLE IF NOT EXISTS covid19_daily (
+            day DATE,
+            country_code TEXT,
+            country_name TEXT,
+            time TIMESTAMPTZ,
+            confirmed DOUBLE PRECISION,
+            death DOUBLE PRECISION,
+            recovered DOUBLE PRECISION,
+            PRIMARY KEY (country_code, day)
+            );
+            CREATE INDEX IF NOT EXISTS idx_covid_daily_day ON covid19_daily(day);
+            CREATE INDEX IF NOT EXISTS idx_covid_daily_time ON covid19_daily(time);
+            CREATE TABLE IF NOT EXISTS covid19_daily_totals (
+            day DATE PRIMARY KEY,
+            confirmed DOUBLE PRECISION,
+            death DOUBLE PRECISION,
+            recovered DOUBLE PRECISION
+            );
+        """)
+        # first run with the rollup: build it from the existing data
+        curr.execute("""
+            INSERT INTO covid19_daily(day, country_code, country_name, time, confirmed, death, recovered)
+                SELECT DISTINCT ON (covid19.country_code, covid19.time::date)
+                    covid19.time::date, country_code, country_name, covid19.time, confirmed, death, recovered
+                    FROM covid19 WHERE NOT EXISTS (SELECT 1 FROM covid19_daily) AND country_code IS NOT NULL
+                    ORDER BY covid19.country_code, covid19.time::date, covid19.time DESC
+        """)
+        if curr.rowcount:
+            self._update_totals(curr)
+
+    @staticmethod
+    def _update_rollup(curr, keys):
+        # keys: (country code, time) of the added records. Recompute the daily rows of those countries & days,
+        # then the world totals from the first of those days onwards
+        curr.execute("""
+            CREATE TEMPORARY TABLE covid19_added (country_code TEXT, day DATE) ON COMMIT DROP
+        """)
+        psycopg2.extras.execute_values(curr, """
+            INSERT INTO covid19_added(country_code, day) VALUES %s
+        """, list(keys), template='(%s, (%s)::date)')
+        curr.execute("""
+            INSERT INTO covid19_daily(day, country_code, country_name, time, confirmed, death, recovered)
+                SELECT DISTINCT ON (covid19.country_code, covid19.time::date)
+                    covid19.time::date, covid19.country_code, covid19.country_name, covid19.time,
+                    covid19.confirmed, covid19.death, covid19.recovered
+                FROM covid19 JOIN (SELECT DISTINCT country_code, day FROM covid19_added) AS added
+                    ON covid19.country_code = added.country_code
+                    AND covid19.time >= added.day AND covid19.time < added.day + 1
+                ORDER BY covid19.country_code, covid19.time::date, covid19.time DESC
+            ON CONFLICT (country_code, day) DO UPDATE SET
+                country_name = EXCLUDED.country_name, time = EXCLUDED.time,
+                confirmed = EXCLUDED.confirmed, death = EXCLUDED.death, recovered = EXCLUDED.recovered
+        """)
+        curr.execute("""SELECT min(day) FROM covid19_added""")
+        first_day = curr.fetchone()[0]
+        curr.execute("""DROP TABLE covid19_added""")
+        CovidPGConnector._update_totals(curr, first_day)
+
+    @staticmethod
+    def _update_totals(curr, first_day=None):
+        # world total on a day = sum of the last value of each country up to that day. Starting from the last
+        # value of each country before first_day, this is the running sum of each country's day-to-day change
+        curr.execute("""
+            INSERT INTO covid19_daily_totals(day, confirmed, death, recovered)
+            SELECT day, confirmed, death, recovered FROM (
+                SELECT day,
+                    sum(sum(confirmed)) OVER (ORDER BY day) AS confirmed,
+                    sum(sum(death)) OVER (ORDER BY day) AS death,
+                    sum(sum(recovered)) OVER (ORDER BY day) AS recovered
+                FROM (
+                    SELECT day,
+                        coalesce(confirmed, 0) - coalesce(lag(confirmed) OVER country, 0) AS confirmed,
+                        coalesce(death, 0) - coalesce(lag(death) OVER country, 0) AS death,
+                        coalesce(recovered, 0) - coalesce(lag(recovered) OVER country, 0) AS recovered
+                    FROM (
+                        (SELECT DISTINCT ON (country_code) country_code, day, confirmed, death, recovered
+                            FROM covid19_daily WHERE day < %(first_day)s ORDER BY country_code, day DESC)
+                        UNION ALL
+                        (SELECT country_code, day, confirmed, death, recovered
+                            FROM covid19_daily WHERE %(first_day)s IS NULL OR day >= %(first_day)s)
+                    ) AS rows
+                    WINDOW country AS (PARTITION BY country_code ORDER BY day)
+                ) AS changes GROUP BY day
+            ) AS totals WHERE %(first_day)s IS NULL OR day >= %(first_day)s
+            ON CONFLICT (day) DO UPDATE SET
+                confirmed = EXCLUDED.confirmed, death = EXCLUDED.death, recovered = EXCLUDED.recovered
+        """, {'first_day': first_day})
+
+    def _add_key(self, curr):
+        # tables created by older versions may hold duplicate records, in which case the key can't be added.
+        # Records are then added without de-duplication until the table is compacted (see compact)
+        curr.execute('SAVEPOINT covid19_key')
+        try:
+            curr.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_covid_code_time ON covid19(country_code, time)
+            """)
+            curr.execute('RELEASE SAVEPOINT covid19_key')
+            self.unique = True
+        except psycopg2.errors.UniqueViolation:
+            curr.execute('ROLLBACK TO SAVEPOINT covid19_key')
+            logging.error('covid19 holds duplicate records. Run utils/compact.py to remove them')
+            self.unique = False
+
+    @staticmethod
+    def _is_heap(curr):
+        curr.execute("""
+            SELECT relkind FROM pg_class WHERE oid = to_regclass('covid19')
+        """)
+        entry = curr.fetchone()
+        return entry is not None and entry[0] == 'r'
+
+    @staticmethod
+    def _create_partitioned(curr):
+        curr.execute("""
+            CREATE TABLE IF NOT EXISTS covid19 (
+            time TIMESTAMPTZ NOT NULL,
+            country_code TEXT,
+            country_name TEXT,
+            confirmed DOUBLE PRECISION,
+            death DOUBLE PRECISION,
+            recovered DOUBLE PRECISION
+            ) PARTITION BY RANGE (time);
+            CREATE INDEX IF NOT EXISTS idx_covid_time_brin ON covid19 USING brin(time);
+            CREATE INDEX IF NOT EXISTS idx_covid_country_time ON covid19(country_name, time);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_covid_code_time ON covid19(country_code, time);
+        """)
+
+    def _add_partitions(self, curr, months):
+        # create the monthly partitions that don't exist yet. The advisory lock serializes concurrent writers
+        # adding the same partition. Returns the months that were checked, to be remembered after commit
+        months = set(months) - self._partitions
+        if months:
+            curr.execute("SELECT pg_advisory_xact_lock(hashtext('covid19_partitions'))")
+            for month in sorted(months):
+                curr.execute(f"""
+                    CREATE TABLE IF NOT EXISTS covid19_{month.strftime('y%Ym%m')} PARTITION OF covid19
+                        FOR VALUES FROM ('{month} 00:00:00+00') TO ('{_next_month(month)} 00:00:00+00')
+                """)  # nosec
+        return months
+
+    def _migrate(self, curr):
+        # move an existing (unpartitioned) covid19 table into the partitioned layout
+        logging.info('Migrating covid19 to a partitioned table')
+        curr.execute("""
+            ALTER TABLE covid19 RENAME TO covid19_heap;
+            DROP INDEX IF EXISTS idx_covid_country_name;
+            DROP INDEX IF EXISTS idx_covid_country_code;
+            DROP INDEX IF EXISTS idx_covid_time;
+            DROP INDEX IF EXISTS idx_covid_code_time;
+        """)
+        self._create_partitioned(curr)
+        curr.execute("""
+            SELECT DISTINCT date_trunc('month', time AT TIME ZONE 'UTC') FROM covid19_heap WHERE time IS NOT NULL
+        """)
+        months = self._add_partitions(curr, [entry[0].date() for entry in curr.fetchall()])
+        curr.execute("""
+            INSERT INTO covid19(time, country_code, country_name, confirmed, death, recovered)
+                SELECT time, country_code, country_name, confirmed, death, recovered FROM covid19_heap
+                WHERE time IS NOT NULL
+                ON CONFLICT (country_code, time) DO NOTHING;
+            DROP TABLE covid19_heap;
+        """)
+        logging.info(f'covid19 migrated: {curr.rowcount} records, {len(months)} partitions')
+        self._partitions.update(months)
 
     def _drop_db(self):
         conn = None
@@ -47,66 +264,266 @@ class CovidPGConnector(PostgresConnector):
             cur.execute("""DROP INDEX IF EXISTS idx_covid19_country""")
             cur.execute("""DROP INDEX IF EXISTS idx_covid19_time""")
             cur.execute("""DROP TABLE IF EXISTS covid19""")
+            cur.execute("""DROP TABLE IF EXISTS covid19_latest""")
+            cur.execute("""DROP TABLE IF EXISTS covid19_daily""")
+            cur.execute("""DROP TABLE IF EXISTS covid19_daily_totals""")
             conn.commit()
+            self._partitions = set()
+            self._last_updated = None
         except (Exception, psycopg2.DatabaseError) as error:
             logging.critical(f'Could not drop covid tables: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
+
+    @staticmethod
+    def _copy(curr, buffer):
+        buffer.seek(0)
+        curr.copy_expert("""
+            COPY covid19_staging(time, country_code, country_name, confirmed, death, recovered)
+                FROM STDIN WITH (FORMAT csv)
+        """, buffer)
+
+    def _merge(self, curr):
+        # move the staged records into covid19. With the (country_code, time) key, a record that's already
+        # stored is only updated if its values changed. Returns the records that were added or updated
+        conflict = """
+            ON CONFLICT (country_code, time) DO UPDATE SET
+                country_name = EXCLUDED.country_name, confirmed = EXCLUDED.confirmed,
+                death = EXCLUDED.death, recovered = EXCLUDED.recovered
+            WHERE (covid19.country_name, covid19.confirmed, covid19.death, covid19.recovered)
+                IS DISTINCT FROM (EXCLUDED.country_name, EXCLUDED.confirmed, EXCLUDED.death, EXCLUDED.recovered)
+        """ if self.unique else ''
+        # if a record is staged more than once, the last one wins
+        curr.execute(f"""
+            INSERT INTO covid19(time, country_code, country_name, confirmed, death, recovered)
+                SELECT DISTINCT ON (country_code, time) time, country_code, country_name, confirmed, death, recovered
+                    FROM covid19_staging ORDER BY country_code, time, ctid DESC
+            {conflict}
+            RETURNING country_name, country_code, time
+        """)  # nosec
+        return curr.fetchall()
 
-    def addmany(self, records):
+    def addmany(self, records, batch_size=5000):
+        # records: dict of country name -> details, or an iterable of (country name, details) pairs.
+        # Rows are streamed to a staging table through COPY, batch_size rows at a time, and merged into covid19
+        # in a single transaction. Returns the number of records added or updated, or None if they could not be added.
         self._init_db()
+        if not records:
+            return 0
         now = datetime.now()
-        changes = [
-            [
-                details['time'] if 'time' in details else now,
-                details['code'],
-                country,
-                details['confirmed'],
-                details['deaths'],
-                details['recovered']
-            ]
-            for country, details in records.items()
-        ]
-        if changes:
-            conn = None
-            try:
-                conn = self.connect()
-                curr = conn.cursor()
-                curr.executemany("""
-                    INSERT INTO covid19(time, country_code, country_name, confirmed, death, recovered)
-                    VALUES(%s,%s,%s,%s,%s,%s)
-                """, changes)
-                curr.close()
-                conn.commit()
-                logging.debug(f'{len(changes)} records added')
-            except (Exception, psycopg2.DatabaseError) as error:
-                logging.critical(f'Failed to insert data: {error}')
-            finally:
-                if conn:
-                    conn.close()
-
-    def list(self, end_time=None):
+        conn = count = None
+        try:
+            conn = self.connect()
+            curr = conn.cursor()
+            curr.execute("""
+                CREATE TEMPORARY TABLE covid19_staging
+                    (LIKE covid19 INCLUDING DEFAULTS EXCLUDING CONSTRAINTS) ON COMMIT DROP
+            """)
+            buffer, writer, batch, months = None, None, 0, set()
+            for country, details in records.items() if isinstance(records, dict) else records:
+                if buffer is None:
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                time = details['time'] if 'time' in details else now
+                if self.partitioned:
+                    months.add(_month(time))
+                writer.writerow([
+                    time,
+                    details['code'],
+                    country,
+                    details['confirmed'],
+                    details['deaths'],
+                    details['recovered']
+                ])
+                batch += 1
+                if batch == batch_size:
+                    self._copy(curr, buffer)
+                    buffer, batch = None, 0
+            if batch:
+                self._copy(curr, buffer)
+            partitions = self._add_partitions(curr, months)
+            added = self._merge(curr)
+            latest = dict()
+            for country, code, time in added:
+                if country not in latest or time > latest[country]:
+                    latest[country] = time
+            if added:
+                psycopg2.extras.execute_values(curr, """
+                    INSERT INTO covid19_latest(country_name, time) VALUES %s
+                    ON CONFLICT (country_name) DO UPDATE SET time = GREATEST(covid19_latest.time, EXCLUDED.time)
+                """, list(latest.items()))
+                self._update_rollup(curr, {(code, time) for _, code, time in added})
+            curr.close()
+            conn.commit()
+            count = len(added)
+            self._partitions.update(partitions)
+            self._advance_last_updated(latest)
+            logging.debug(f'{count} records added')
+        except (Exception, psycopg2.DatabaseError) as error:
+            logging.critical(f'Failed to insert data: {error}')
+        finally:
+            if conn:
+                self.release(conn)
+        return count
+
+    def compact(self, full=False):
+        # one-shot cleanup of tables created before the (country_code, time) key: removes duplicate records
+        # (keeping the last one written), adds the key and vacuums the table. Returns the number of records removed
+        self._init_db()
+        conn = removed = None
+        try:
+            conn = self.connect()
+            curr = conn.cursor()
+            curr.execute("""
+                DELETE FROM covid19 WHERE (tableoid, ctid) IN (
+                    SELECT tableoid, ctid FROM (
+                        SELECT tableoid, ctid,
+                            row_number() OVER (PARTITION BY country_code, time ORDER BY ctid DESC) AS copy
+                        FROM covid19 WHERE country_code IS NOT NULL
+                    ) AS records WHERE copy > 1
+                )
+            """)
+            removed = curr.rowcount
+            self._add_key(curr)
+            conn.commit()
+            conn.autocommit = True
+            curr.execute('VACUUM FULL ANALYZE covid19' if full else 'VACUUM ANALYZE covid19')
+            curr.close()
+            logging.info(f'covid19 compacted: {removed} duplicate records removed')
+        except (Exception, psycopg2.DatabaseError) as error:
+            logging.critical(f'Failed to compact covid19 table: {error}')
+            removed = None
+        finally:
+            if conn:
+                conn.autocommit = False
+                self.release(conn)
+        return removed
+
+    def list(self, end_time=None, start_time=None):
         conn = rows = None
         try:
             conn = self.connect()
             cur = conn.cursor()
+            conditions, args = [], []
+            if start_time:
+                conditions.append('time > (%s)')
+                args.append(start_time)
             if end_time:
-                cur.execute("""
+                conditions.append('time < (%s)')
+                args.append(end_time)
+            where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+            cur.execute(f"""
                 SELECT time, country_code, country_name, confirmed, death, recovered FROM covid19
-                    WHERE time < (%s) ORDER BY time
-            """, (end_time,))
-            else:
-                cur.execute("""
-                    SELECT time, country_code, country_name, confirmed, death, recovered FROM covid19 ORDER BY time
-                """)
+                    {where} ORDER BY time, country_code
+            """, args)  # nosec
+            rows = cur.fetchall()
+            cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            logging.critical(f'Failed to get data: {error}')
+        finally:
+            if conn:
+                self.release(conn)
+        return rows
+
+    def list_daily(self, start_time=None, end_time=None):
+        # last entry per country per day, for the days in [start_time, end_time], plus the last entry per country
+        # before start_time so the caller can carry values forward into the window
+        conn = rows = None
+        try:
+            conn = self.connect()
+            cur = conn.cursor()
+            conditions = []
+            if start_time:
+                conditions.append("time >= date_trunc('day', %(start_time)s::timestamptz)")
+            if end_time:
+                conditions.append("time < date_trunc('day', %(end_time)s::timestamptz) + interval '1 day'")
+            where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+            query = f"""
+                (SELECT DISTINCT ON (country_code, date_trunc('day', time))
+                    time, country_code, country_name, confirmed, death, recovered FROM covid19
+                    {where} ORDER BY country_code, date_trunc('day', time), time DESC)
+            """
+            if start_time:
+                query = f"""
+                    (SELECT DISTINCT ON (country_code)
+                        time, country_code, country_name, confirmed, death, recovered FROM covid19
+                        WHERE time < date_trunc('day', %(start_time)s::timestamptz) ORDER BY country_code, time DESC)
+                    UNION ALL {query}
+                """
+            cur.execute(f'SELECT * FROM ({query}) AS daily ORDER BY time',
+                        {'start_time': start_time, 'end_time': end_time})  # nosec
+            rows = cur.fetchall()
+            cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            logging.critical(f'Failed to get data: {error}')
+        finally:
+            if conn:
+                self.release(conn)
+        return rows
+
+    def list_rollup(self, start_time=None, end_time=None, since=None):
+        # covid19_daily rows for the days in [start_time, end_time], plus the last row per country before
+        # start_time (same layout as list_daily). With since, only the rows updated with records after that time
+        conn = rows = None
+        try:
+            conn = self.connect()
+            cur = conn.cursor()
+            conditions = []
+            if since:
+                conditions.append('time > %(since)s::timestamptz')
+            if start_time:
+                conditions.append('day >= %(start_time)s::timestamptz::date')
+            if end_time:
+                conditions.append('day <= %(end_time)s::timestamptz::date')
+            where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+            query = f"""
+                (SELECT time, country_code, country_name, confirmed, death, recovered FROM covid19_daily {where})
+            """
+            if start_time and not since:
+                query = f"""
+                    (SELECT DISTINCT ON (country_code)
+                        time, country_code, country_name, confirmed, death, recovered FROM covid19_daily
+                        WHERE day < %(start_time)s::timestamptz::date ORDER BY country_code, day DESC)
+                    UNION ALL {query}
+                """
+            cur.execute(f'SELECT * FROM ({query}) AS daily ORDER BY time',
+                        {'start_time': start_time, 'end_time': end_time, 'since': since})  # nosec
             rows = cur.fetchall()
             cur.close()
         except (Exception, psycopg2.DatabaseError) as error:
             logging.critical(f'Failed to get data: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
+        return rows
+
+    def list_totals(self, start_time=None, end_time=None, since=None):
+        # world totals (day, confirmed, death, recovered) for the days in [start_time, end_time], plus the
+        # last day before start_time. With since, the totals from the day of that time onwards
+        conn = rows = None
+        try:
+            conn = self.connect()
+            cur = conn.cursor()
+            conditions = []
+            if since:
+                conditions.append('day >= %(since)s::timestamptz::date')
+            if start_time:
+                conditions.append("""day >= coalesce((SELECT max(day) FROM covid19_daily_totals
+                    WHERE day < %(start_time)s::timestamptz::date), %(start_time)s::timestamptz::date)""")
+            if end_time:
+                conditions.append('day <= %(end_time)s::timestamptz::date')
+            where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+            cur.execute(f"""
+                SELECT day, confirmed, death, recovered FROM covid19_daily_totals {where} ORDER BY day
+            """, {'start_time': start_time, 'end_time': end_time, 'since': since})  # nosec
+            rows = cur.fetchall()
+            cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            logging.critical(f'Failed to get data: {error}')
+        finally:
+            if conn:
+                self.release(conn)
         return rows
 
     def get_first(self, country):
@@ -114,8 +531,8 @@ class CovidPGConnector(PostgresConnector):
         try:
             conn = self.connect()
             cur = conn.cursor()
-            cur.execute("""
-                SELECT min(time) FROM covid19 WHERE country_name = %s
+            self.execute_prepared(conn, cur, 'covid19_first', """
+                SELECT min(time) FROM covid19 WHERE country_name = $1
             """, (country,))
             entry = cur.fetchone()
             cur.close()
@@ -123,24 +540,52 @@ class CovidPGConnector(PostgresConnector):
             logging.critical(f'Failed to get data: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
         return entry[0] if entry else None
 
+    def get_latest_time(self):
+        conn = entry = None
+        try:
+            conn = self.connect()
+            cur = conn.cursor()
+            self.execute_prepared(conn, cur, 'covid19_latest_time', """
+                SELECT max(time) FROM covid19
+            """)
+            entry = cur.fetchone()
+            cur.close()
+        except (Exception, psycopg2.DatabaseError) as error:
+            logging.critical(f'Failed to get data: {error}')
+        finally:
+            if conn:
+                self.release(conn)
+        return entry[0] if entry else None
+
+    def _advance_last_updated(self, latest):
+        if self._last_updated is None:
+            return
+        for country, time in latest.items():
+            # naive timestamps are reported in UTC
+            time = time if time.tzinfo else pytz.UTC.localize(time)
+            if country not in self._last_updated or time > self._last_updated[country]:
+                self._last_updated[country] = time
+
     def get_last_updated(self):
+        # last update time per country. Loaded once from covid19_latest and advanced by addmany afterwards
+        if self._last_updated is not None:
+            return self._last_updated
+        self._init_db()
         conn = None
-        last_updates = dict()
         try:
             conn = self.connect()
             cur = conn.cursor()
-            cur.execute("""
-                SELECT country_name, max(time) FROM covid19 GROUP BY country_name
+            self.execute_prepared(conn, cur, 'covid19_last_updated', """
+                SELECT country_name, time FROM covid19_latest
             """)
-            for entry in cur.fetchall():
-                last_updates[entry[0]] = entry[1]
+            self._last_updated = {entry[0]: entry[1] for entry in cur.fetchall()}
             cur.close()
         except (Exception, psycopg2.DatabaseError) as error:
             logging.critical(f'Failed to get data: {error}')
         finally:
             if conn:
-                conn.close()
-        return last_updates
+                self.release(conn)
+        return self._last_updated if self._last_updated is not None else dict()
@@ -1,28 +1,142 @@
 from abc import ABC, abstractmethod
+import threading
 import psycopg2
+from prometheus_client import Gauge, Counter, Summary
+
+POOL_IN_USE = Gauge('postgres_pool_connections_in_use', 'Pooled connections currently in use', ['database'])
+POOL_WAITS = Counter('postgres_pool_waits_total', 'Number of times a caller had to wait for a connection', ['database'])
+POOL_CONNECT_TIME = Summary('postgres_pool_connect_seconds', 'Time spent opening new connections', ['database'])
 
 
 class DBError(Exception):
     pass
 
 
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    At most `size` connections are handed out at any time: further callers wait until one is released.
+    Connections are opened on demand and kept open for reuse.
+    """
+    def __init__(self, host, port, database, user, password, size=5):
+        self.host = host
+        self.port = port
+        self.database = database
+        self.user = user
+        self.password = password
+        self.size = size
+        self._idle = []
+        self._prepared = dict()
+        self._lock = threading.Lock()
+        self._available = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        with POOL_CONNECT_TIME.labels(self.database).time():
+            return psycopg2.connect(
+                host=self.host,
+                port=self.port,
+                database=self.database,
+                user=self.user,
+                password=self.password
+            )
+
+    def getconn(self):
+        if not self._available.acquire(blocking=False):
+            POOL_WAITS.labels(self.database).inc()
+            self._available.acquire()
+        try:
+            conn = None
+            with self._lock:
+                while self._idle and conn is None:
+                    conn = self._idle.pop()
+                    if conn.closed:
+                        self._discard(conn)
+                        conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._available.release()
+            raise
+        POOL_IN_USE.labels(self.database).inc()
+        return conn
+
+    def putconn(self, conn):
+        try:
+            if not conn.closed:
+                # end any transaction left open (e.g. by a SELECT or a failed statement)
+                conn.rollback()
+        except psycopg2.Error:
+            conn.close()
+        with self._lock:
+            if conn.closed:
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+        POOL_IN_USE.labels(self.database).dec()
+        self._available.release()
+
+    def _discard(self, conn):
+        self._prepared.pop(id(conn), None)
+
+    def prepared(self, conn):
+        # names of the statements prepared on this connection
+        with self._lock:
+            return self._prepared.setdefault(id(conn), set())
+
+    def closeall(self):
+        with self._lock:
+            for conn in self._idle:
+                self._discard(conn)
+                conn.close()
+            self._idle = []
+
+
 class PostgresConnector(ABC):
-    def __init__(self, host, port, database, user, password):
+    # connection pools are shared by all connectors for the same database
+    _pools = dict()
+    _pools_lock = threading.Lock()
+
+    def __init__(self, host, port, database, user, password, pool_size=5):
         self.host = host
         self.port = port
         self.database = database
         self.user = user
         self.password = password
+        self.pool_size = pool_size
         self.first = True
 
+    @property
+    def pool(self):
+        key = (self.host, self.port, self.database, self.user)
+        with PostgresConnector._pools_lock:
+            if key not in PostgresConnector._pools:
+                PostgresConnector._pools[key] = ConnectionPool(
+                    self.host, self.port, self.database, self.user, self.password, self.pool_size
+                )
+            return PostgresConnector._pools[key]
+
     def connect(self):
-        return psycopg2.connect(
-            host=self.host,
-            port=self.port,
-            database=self.database,
-            user=self.user,
-            password=self.password
-        )
+        return self.pool.getconn()
+
+    def release(self, conn):
+        self.pool.putconn(conn)
+
+    def execute_prepared(self, conn, cur, name, query, args=()):
+        """
+        Execute a fixed query as a server-side prepared statement.
+
+        The statement is prepared the first time it is used on a connection. Parameters in the query
+        are written as $1, $2, ...
+        """
+        prepared = self.pool.prepared(conn)
+        if name not in prepared:
+            cur.execute(f'PREPARE {name} AS {query}')
+            prepared.add(name)
+        if args:
+            cur.execute(f'EXECUTE {name}({", ".join(["%s"] * len(args))})', args)
+        else:
+            cur.execute(f'EXECUTE {name}')
 
     def _init_db(self):
         if self.first:
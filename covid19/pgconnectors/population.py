@@ -4,8 +4,8 @@ from covid19.pgconnectors.pgconnector import PostgresConnector
 
 
 class PopulationPGConnector(PostgresConnector):
-    def __init__(self, host, port, database, user, password):
-        super().__init__(host, port, database, user, password)
+    def __init__(self, host, port, database, user, password, pool_size=5):
+        super().__init__(host, port, database, user, password, pool_size)
         self.first = True
         self.reported = {}
 
@@ -26,7 +26,7 @@ class PopulationPGConnector(PostgresConnector):
             logging.critical(f'Failed to create table: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
 
     def _drop_db(self):
         conn = None
@@ -39,7 +39,7 @@ class PopulationPGConnector(PostgresConnector):
             logging.critical(f'Could not drop tables: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
 
     def addmany(self, records):
         self._init_db()
@@ -59,7 +59,7 @@ class PopulationPGConnector(PostgresConnector):
             logging.critical(f'Failed to insert data: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
 
     def list(self):
         conn = None
@@ -67,7 +67,7 @@ class PopulationPGConnector(PostgresConnector):
         try:
             conn = self.connect()
             cur = conn.cursor()
-            cur.execute("""
+            self.execute_prepared(conn, cur, 'population_list', """
                 SELECT country_code, population FROM population ORDER BY 1
             """)
             for fetched in cur.fetchall():
@@ -77,5 +77,5 @@ class PopulationPGConnector(PostgresConnector):
             logging.critical(f'Failed to get data: {error}')
         finally:
             if conn:
-                conn.close()
+                self.release(conn)
         return rows
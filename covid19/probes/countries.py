@@ -263,3 +263,14 @@ country_codes = {
     'Zambia': 'ZM',
     'Zimbabwe': 'ZW',
 }
+
+# Groupings of country codes, used to serve per-region totals
+regions = {
+    'EU': [
+        'AT', 'BE', 'BG', 'HR', 'CY', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE',
+        'IT', 'LV', 'LT', 'LU', 'MT', 'NL', 'PL', 'PT', 'RO', 'SK', 'SI', 'ES', 'SE',
+    ],
+    'Benelux': ['BE', 'NL', 'LU'],
+    'Nordics': ['DK', 'FI', 'IS', 'NO', 'SE'],
+    'G7': ['CA', 'FR', 'DE', 'IT', 'JP', 'GB', 'US'],
+}
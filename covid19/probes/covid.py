@@ -1,89 +1,90 @@
 from abc import ABC
 import logging
 from datetime import datetime
-import pytz
-from prometheus_client import Summary, Gauge
-from pimetrics.probe import APIProbe
+from prometheus_client import Gauge, Counter
 from covid19.pgconnectors.pgconnector import DBError
-from covid19.probes.countries import country_codes
+from covid19.probes.http import HTTPProbe
+from covid19.probes.stats import StatsParser, parse_time
 from covid19.metrics import MetricsPusher
 
-REQUEST_TIME = Summary('request_processing_seconds', 'Time spent processing request', ['server', 'endpoint'])
 GAUGES = {
     'lastReported': Gauge('covid_last_reported_seconds', 'Timestamp of last update (epoch)'),
 }
+STATS_SKIPPED = Counter('covid_stats_skipped_total', 'Number of /v1/stats calls skipped as lastReported did not change')
 
 
-class CovidProbe(APIProbe, ABC):
-    def __init__(self, api_key):
-        super().__init__('https://covid-19-coronavirus-statistics.p.rapidapi.com')
+class CovidProbe(HTTPProbe, ABC):
+    def __init__(self, api_key, timeout=None):
+        super().__init__('https://covid-19-coronavirus-statistics.p.rapidapi.com', timeout)
         self.headers = {
             'x-rapidapi-key': api_key,
             'x-rapidapi-host': 'covid-19-coronavirus-statistics.p.rapidapi.com'
         }
 
     def apicall(self, endpoint, params=None):
-        with REQUEST_TIME.labels(self.url, endpoint).time():
-            return self.call(endpoint, headers=self.headers, params=params)
+        return self.call(endpoint, headers=self.headers, params=params)
 
 
 class CovidCountryProbe(CovidProbe):
-    def __init__(self, api_key, dbconnector=None, pushgateway_url=None):
-        super().__init__(api_key)
+    """
+    Measures the latest figures per country from /v1/stats.
+
+    If a last_update probe (CovidLastUpdateProbe) is given, it is run first and /v1/stats is only fetched
+    if lastReported moved on since the last successful ingest.
+    """
+    def __init__(self, api_key, dbconnector=None, pushgateway_url=None, last_update=None, timeout=None):
+        super().__init__(api_key, timeout)
         self._countries = None
-        self._bad_countries = []
+        self._parser = StatsParser()
         self._dbconnector = dbconnector
         self._pushgateway = MetricsPusher(pushgateway_url) if pushgateway_url else None
+        self._last_update = last_update
+        self._ingested = None
+        self._reported = None
 
     def apicall(self, endpoint, country=None):
         params = {'country': country} if country else None
         return super().apicall(endpoint, params)
 
     def report(self, output):
+        if output is None:
+            return
+        ingested = True
         if self._dbconnector:
             try:
-                self._dbconnector.addmany(output)
+                ingested = self._dbconnector.addmany(output) is not None
             except DBError as err:
                 logging.error(f'Could not insert data in covid19 db: {err}')
+                ingested = False
         if self._pushgateway:
             self._pushgateway.report(output)
+        if ingested and self._reported is not None:
+            self._ingested = self._reported
         logging.info(f'{len(output)} new records')
 
+    def _changed(self):
+        self._reported = None
+        if self._last_update:
+            self._last_update.run()
+            self._reported = (self._last_update.measured() or {}).get('lastReported')
+        return self._reported is None or self._reported != self._ingested
+
     def measure(self):
-        def nonetozero(val):
-            return val if val is not None else 0
-        output = {}
+        if not self._changed():
+            logging.info('No new data reported. Skipping')
+            STATS_SKIPPED.inc()
+            return None
         last_updated = self._dbconnector.get_last_updated() if self._dbconnector else None
         stats = self.apicall('/v1/stats')
-        if stats:
-            for entry in stats['data']['covid19Stats']:
-                country = entry['country']
-                if country not in country_codes:
-                    if country not in self._bad_countries:
-                        logging.warning(f'Could not find country code for "{country}". Skipping ...')
-                        self._bad_countries.append(country)
-                    continue
-                update = pytz.UTC.localize(datetime.strptime(entry['lastUpdate'], '%Y-%m-%dT%H:%M:%S+00:00'))
-                if last_updated and country in last_updated.keys() and update <= last_updated[country]:
-                    continue
-                if country not in output:
-                    output[country] = {
-                        # Grafana world map uses country codes ('BE') rather than names ('Belgium')
-                        'code': country_codes[country],
-                        'confirmed': 0,
-                        'deaths': 0,
-                        'recovered': 0
-                    }
-                output[country]['confirmed'] += nonetozero(entry['confirmed'])
-                output[country]['deaths'] += nonetozero(entry['deaths'])
-                output[country]['recovered'] += nonetozero(entry['recovered'])
-                output[country]['time'] = datetime.strptime(entry['lastUpdate'], '%Y-%m-%dT%H:%M:%S+00:00')
-        return output
+        if not stats:
+            self._reported = None
+            return {}
+        return self._parser.aggregate(stats['data']['covid19Stats'], last_updated)
 
 
 class CovidLastUpdateProbe(CovidProbe):
-    def __init__(self, api_key):
-        super().__init__(api_key)
+    def __init__(self, api_key, timeout=None):
+        super().__init__(api_key, timeout)
 
     def report(self, output):
         if 'lastReported' in output:
@@ -93,6 +94,6 @@ class CovidLastUpdateProbe(CovidProbe):
         output = {}
         stats = self.apicall('/v1/total')
         if stats:
-            utc_time = datetime.strptime(stats['data']['lastReported'], "%Y-%m-%dT%H:%M:%S+00:00")
+            utc_time = parse_time(stats['data']['lastReported'])
             output['lastReported'] = (utc_time - datetime(1970, 1, 1)).total_seconds()
         return output
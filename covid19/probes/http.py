@@ -0,0 +1,56 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from pimetrics.probe import APIProbe
+from prometheus_client import Summary
+
+REQUEST_TIME = Summary('request_processing_seconds', 'Time spent processing request', ['server', 'endpoint'])
+RESPONSE_SIZE = Summary('request_response_bytes', 'Size of the (decompressed) response body', ['server', 'endpoint'])
+
+# (connect, read) timeouts, in seconds
+DEFAULT_TIMEOUT = (5, 30)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size=10):
+    # one session for all probes & the backfill, so connections are pooled & kept alive across calls and runs
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _session.headers['Accept-Encoding'] = 'gzip'
+        return _session
+
+
+def request(method, server, endpoint='', label=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    # label: endpoint name to report in metrics, for endpoints that hold parameters (e.g. country names)
+    label = label if label is not None else endpoint
+    with REQUEST_TIME.labels(server, label).time():
+        response = get_session().request(method, f'{server}{endpoint}', timeout=timeout, **kwargs)
+    RESPONSE_SIZE.labels(server, label).observe(len(response.content))
+    return response
+
+
+class HTTPProbe(APIProbe):
+    """
+    APIProbe that sends its requests through the shared session, with timeouts & request metrics.
+    """
+    def __init__(self, url, timeout=None):
+        super().__init__(url)
+        self.timeout = timeout if timeout else DEFAULT_TIMEOUT
+
+    def _request(self, method, endpoint, headers, body, params):
+        body = {'json': body} if self.is_json else {'data': body}
+        return request(method, self.url, endpoint, headers=headers, params=params, proxies=self.proxies,
+                       timeout=self.timeout, **body)
+
+    def get(self, endpoint='', headers=None, body=None, params=None):
+        return self._request('GET', endpoint, headers, body, params)
+
+    def post(self, endpoint='', headers=None, body=None, params=None):
+        return self._request('POST', endpoint, headers, body, params)
@@ -1,11 +1,11 @@
 import logging
-from pimetrics.probe import APIProbe
+from covid19.probes.http import HTTPProbe
 from covid19.probes.countries import country_codes
 
 
-class PopulationProbe(APIProbe):
-    def __init__(self, api_key, dbconnector=None):
-        super().__init__('https://ajayakv-rest-countries-v1.p.rapidapi.com')
+class PopulationProbe(HTTPProbe):
+    def __init__(self, api_key, dbconnector=None, timeout=None):
+        super().__init__('https://ajayakv-rest-countries-v1.p.rapidapi.com', timeout)
         self.headers = {
             'x-rapidapi-host': "ajayakv-rest-countries-v1.p.rapidapi.com",
             'x-rapidapi-key': api_key
@@ -0,0 +1,70 @@
+import logging
+from datetime import datetime, timezone
+from covid19.probes.countries import country_codes
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S+00:00'
+
+
+def parse_time(text):
+    # fast path for the fixed format used by the API ('2020-09-03T04:28:22+00:00'). Returns a naive UTC datetime
+    if len(text) == 25 and text[4] == '-' and text[7] == '-' and text[10] == 'T' and text[19:] == '+00:00':
+        try:
+            return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                            int(text[11:13]), int(text[14:16]), int(text[17:19]))
+        except ValueError:
+            pass
+    return datetime.strptime(text, TIME_FORMAT)
+
+
+class StatsParser:
+    """
+    Turns the province-level entries of /v1/stats into one record per country.
+
+    Provinces are added up in a single pass. Each lastUpdate string is parsed once: the API repeats the same
+    handful of timestamps across all entries, so parsed times are kept in a small memo.
+    """
+    def __init__(self, codes=None, memo_size=1024):
+        self.codes = codes if codes is not None else country_codes
+        self.memo_size = memo_size
+        self.unknown = set()
+        self._times = dict()
+
+    def parse_time(self, text):
+        time = self._times.get(text)
+        if time is None:
+            if len(self._times) >= self.memo_size:
+                self._times.clear()
+            time = self._times[text] = parse_time(text)
+        return time
+
+    def aggregate(self, entries, last_updated=None):
+        # entries older than (or as old as) the country's last update in last_updated are skipped
+        output = dict()
+        cutoffs = dict()
+        if last_updated:
+            # compare as naive UTC times, so entries don't need to be localized
+            cutoffs = {
+                country: time.astimezone(timezone.utc).replace(tzinfo=None) if time.tzinfo else time
+                for country, time in last_updated.items()
+            }
+        for entry in entries:
+            country = entry['country']
+            code = self.codes.get(country)
+            if code is None:
+                if country not in self.unknown:
+                    logging.warning(f'Could not find country code for "{country}". Skipping ...')
+                    self.unknown.add(country)
+                continue
+            time = self.parse_time(entry['lastUpdate'])
+            cutoff = cutoffs.get(country)
+            if cutoff is not None and time <= cutoff:
+                continue
+            record = output.get(country)
+            if record is None:
+                # Grafana world map uses country codes ('BE') rather than names ('Belgium')
+                record = output[country] = {'code': code, 'confirmed': 0, 'deaths': 0, 'recovered': 0}
+            record['confirmed'] += entry['confirmed'] or 0
+            record['deaths'] += entry['deaths'] or 0
+            record['recovered'] += entry['recovered'] or 0
+            record['time'] = time
+        return output
@@ -1,5 +1,10 @@
 from covid19.apiserver.apiserver import main
+from covid19.apiserver.asgi import main as asgi_main
 from covid19.apiserver.configuration import get_configuration
 
 if __name__ == '__main__':
-    main(get_configuration())
+    configuration = get_configuration()
+    if configuration.asgi:
+        asgi_main(configuration)
+    else:
+        main(configuration)
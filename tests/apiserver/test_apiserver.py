@@ -0,0 +1,80 @@
+import gzip
+import json
+from datetime import datetime
+from covid19.apiserver.apiserver import app, g_covid19api, g_responses
+from covid19.apiserver.responsecache import ResponseCache
+from tests.apiserver.test_covid19api import CovidPGConnectorStub, test_data
+
+query = {
+    'range': {'from': '2020-01-01T00:00:00.000Z', 'to': '2020-01-31T00:00:00.000Z'},
+    'maxDataPoints': 100,
+    'intervalMs': 60000,
+    'targets': [{'target': 'confirmed', 'type': 'timeserie'}],
+}
+
+
+def test_search():
+    client = app.test_client()
+    response = client.post('/search')
+    assert response.status_code == 200
+    assert 'confirmed' in response.get_json()
+    response = client.post('/search', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_query():
+    stub = CovidPGConnectorStub(list(test_data))
+    g_covid19api.set_covidpg(stub)
+    client = app.test_client()
+    response = client.post('/query', data=json.dumps(query))
+    assert response.status_code == 200
+    assert response.get_json() == [
+        {
+            'target': 'confirmed',
+            'datapoints': [
+                [1, 1577836800000],
+                [3, 1578182400000],
+                [4, 1578355200000],
+                [20, 1578528000000],
+            ]
+        }
+    ]
+    etag = response.headers['ETag']
+    assert len(g_responses) == 1
+    response = client.post('/query', data=json.dumps(query), headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    response = client.post('/query', data=json.dumps(query))
+    assert response.status_code == 200
+    assert response.headers['ETag'] == etag
+    stub.data.append((datetime(2020, 1, 10), 'BE', '', 10, 0, 0))
+    response = client.post('/query', data=json.dumps(query), headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()[0]['datapoints'][-1] == [21, 1578614400000]
+
+
+def test_response_cache():
+    cache = ResponseCache(size=2)
+    cache.put('a', 1, 'A')
+    cache.put('b', 1, 'B')
+    assert cache.get('a', 1) == 'A'
+    cache.put('c', 1, 'C')
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == 'A'
+    assert cache.get('c', 1) == 'C'
+    assert cache.get('a', 2) is None
+    assert len(cache) == 0
+
+
+def test_query_gzip():
+    g_covid19api.set_covidpg(CovidPGConnectorStub(list(test_data)))
+    client = app.test_client()
+    plain = client.post('/query', data=json.dumps(query))
+    assert 'Content-Encoding' not in plain.headers
+    response = client.post('/query', data=json.dumps(query), headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] != plain.headers['ETag']
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    cached = client.post('/query', data=json.dumps(query), headers={'Accept-Encoding': 'gzip'})
+    assert cached.data == response.data
@@ -0,0 +1,121 @@
+import asyncio
+import gzip
+import json
+from covid19.apiserver.asgi import GrafanaApp, etag_matches
+from covid19.apiserver.covid19api import AsyncCovid19API
+from tests.apiserver.test_covid19api import CovidPGConnectorStub, test_data
+from tests.apiserver.test_apiserver import query
+
+
+class AsyncCovidPGConnectorStub:
+    def __init__(self, data):
+        self.stub = CovidPGConnectorStub(data)
+        self.connected = False
+
+    async def connect(self):
+        self.connected = True
+
+    async def close(self):
+        self.connected = False
+
+    async def list(self, end_time=None, start_time=None):
+        return self.stub.list(end_time, start_time)
+
+    async def list_daily(self, start_time=None, end_time=None):
+        return self.stub.list_daily(start_time, end_time)
+
+    async def get_latest_time(self):
+        return max(entry[0] for entry in self.stub.data)
+
+
+def call(app, method, path, body=b'', headers=None):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path,
+        'headers': [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    }
+    asyncio.run(app(scope, receive, send))
+    response_headers = {key.decode(): value.decode() for key, value in messages[0]['headers']}
+    return messages[0]['status'], response_headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def get_app(cache=True):
+    api = AsyncCovid19API(cache=cache)
+    api.set_covidpg(AsyncCovidPGConnectorStub(list(test_data)))
+    return GrafanaApp(api)
+
+
+def test_asgi_index():
+    app = get_app()
+    assert call(app, 'GET', '/')[0] == 200
+    assert call(app, 'GET', '/foo')[0] == 404
+    status, _, body = call(app, 'GET', '/metrics')
+    assert status == 200
+    assert b'http_request_duration_seconds' in body
+
+
+def test_asgi_search():
+    app = get_app()
+    status, headers, body = call(app, 'POST', '/search')
+    assert status == 200
+    assert 'confirmed' in json.loads(body)
+    assert call(app, 'POST', '/search', headers={'If-None-Match': headers['etag']})[0] == 304
+
+
+def test_asgi_query():
+    for cache in [True, False]:
+        app = get_app(cache)
+        status, headers, body = call(app, 'POST', '/query', json.dumps(query).encode())
+        assert status == 200
+        assert json.loads(body) == [
+            {
+                'target': 'confirmed',
+                'datapoints': [
+                    [1, 1577836800000],
+                    [3, 1578182400000],
+                    [4, 1578355200000],
+                    [20, 1578528000000],
+                ]
+            }
+        ]
+        etag = headers['etag']
+        assert call(app, 'POST', '/query', json.dumps(query).encode(), {'If-None-Match': etag})[0] == 304
+        status, headers, compressed = call(app, 'POST', '/query', json.dumps(query).encode(),
+                                           {'Accept-Encoding': 'gzip'})
+        assert status == 200
+        assert headers['content-encoding'] == 'gzip'
+        assert gzip.decompress(compressed) == body
+        assert call(app, 'POST', '/query', json.dumps(query).encode(), {'Accept-Encoding': 'gzip'})[2] == compressed
+
+
+def test_asgi_lifespan():
+    app = get_app()
+    messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message['type'])
+        if message['type'] == 'lifespan.startup.complete':
+            assert app.api.covid19pg.connected
+
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert app.api.covid19pg.connected is False
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', 'abc')
+    assert etag_matches('"xyz", W/"abc"', 'abc')
+    assert etag_matches('*', 'abc')
+    assert not etag_matches('', 'abc')
+    assert not etag_matches('"abcd"', 'abc')
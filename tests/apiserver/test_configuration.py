@@ -6,12 +6,16 @@ def test_default_config():
     assert config.debug is False
     assert config.port == 8080
     assert config.postgres_database == 'covid19'
+    assert config.no_cache is False
+    assert config.engine == 'python'
 
 
 def test_main_config():
-    args = '--port 1234 --postgres-database=covid'.split()
+    args = '--port 1234 --postgres-database=covid --no-cache --engine numpy'.split()
     config = get_configuration(args)
     assert config.port == 1234
+    assert config.no_cache is True
+    assert config.engine == 'numpy'
     assert config.debug is False
     assert config.postgres_database == "covid"
 
@@ -20,13 +24,15 @@ def test_print_config():
     args = '--postgres-host foobar --postgres-port 5432 --postgres-database snafu'.split()
     config = get_configuration(args)
     output = print_configuration(config)
-    assert output == 'port=8080, debug=False, postgres_host=foobar, postgres_port=5432, ' \
-                     'postgres_database=snafu, postgres_user=None, postgres_password=None'
+    assert output == 'port=8080, debug=False, no_cache=False, engine=python, asgi=False, postgres_host=foobar, ' \
+                     'postgres_port=5432, postgres_database=snafu, postgres_user=None, postgres_password=None, ' \
+                     'postgres_pool_size=5'
 
 
 def test_redacted_config():
     args = '--postgres-user foo --postgres-password bar'.split()
     config = get_configuration(args)
     output = print_configuration(config)
-    assert output == 'port=8080, debug=False, postgres_host=None, postgres_port=5432, ' \
-                     'postgres_database=covid19, postgres_user=foo, postgres_password=************'
+    assert output == 'port=8080, debug=False, no_cache=False, engine=python, asgi=False, postgres_host=None, ' \
+                     'postgres_port=5432, postgres_database=covid19, postgres_user=foo, ' \
+                     'postgres_password=************, postgres_pool_size=5'
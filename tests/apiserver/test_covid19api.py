@@ -5,12 +5,30 @@ from covid19.apiserver.covid19api import Covid19API
 class CovidPGConnectorStub:
     def __init__(self, data):
         self.data = data
+        self.fetched = 0
 
-    def list(self, end_time=None):
-        if end_time is None:
-            return self.data
-        redux = list(filter(lambda x: Covid19API.datetime_to_epoch(x[0]) <= Covid19API.grafana_date_to_epoch(end_time),
-                            self.data))
+    def list(self, end_time=None, start_time=None):
+        redux = self.data
+        if end_time is not None:
+            redux = list(filter(
+                lambda x: Covid19API.datetime_to_epoch(x[0]) <= Covid19API.grafana_date_to_epoch(end_time), redux))
+        if start_time is not None:
+            redux = list(filter(lambda x: x[0] > start_time, redux))
+        self.fetched += len(redux)
+        return redux
+
+    def list_daily(self, start_time=None, end_time=None):
+        start = Covid19API.grafana_date_to_epoch(start_time)
+        end = Covid19API.grafana_date_to_epoch(end_time)
+        carry, daily = dict(), dict()
+        for entry in self.data:
+            day = Covid19API.datetime_to_epoch(entry[0])
+            if day < start:
+                carry[entry[1]] = entry
+            elif not end or day <= end:
+                daily[(day, entry[1])] = entry
+        redux = sorted(list(carry.values()) + list(daily.values()), key=lambda x: x[0])
+        self.fetched += len(redux)
         return redux
 
 
@@ -132,3 +150,176 @@ def test_covid19api():
             ]
         }
     ]
+
+
+def test_covid19api_incremental():
+    stub = CovidPGConnectorStub(list(test_data))
+    covid19api = Covid19API()
+    covid19api.set_covidpg(stub)
+    assert covid19api.get_data([('confirmed', '')])[0]['datapoints'][-1] == [20, 1578528000000]
+    assert stub.fetched == len(test_data)
+    assert covid19api.get_data([('confirmed', '')])[0]['datapoints'][-1] == [20, 1578528000000]
+    assert stub.fetched == len(test_data)
+    stub.data.append((datetime(2020, 1, 9, 12), 'US', '', 4, 0, 0))
+    stub.data.append((datetime(2020, 1, 10), 'BE', '', 10, 1, 0))
+    assert covid19api.get_data([('confirmed', ''), ('confirmed-delta', '')]) == [
+        {
+            'target': 'confirmed',
+            'datapoints': [
+                [1, 1577836800000],
+                [3, 1578182400000],
+                [4, 1578355200000],
+                [22, 1578528000000],
+                [23, 1578614400000],
+            ]
+        },
+        {
+            'target': 'confirmed-delta',
+            'datapoints': [
+                [1, 1577836800000],
+                [2, 1578182400000],
+                [1, 1578355200000],
+                [18, 1578528000000],
+                [1, 1578614400000],
+            ]
+        }
+    ]
+    assert stub.fetched == len(test_data) + 2
+    assert covid19api.get_data([('active-delta', '')], start_time='2020-01-10T00:00:00.000Z') == [
+        {
+            'target': 'active-delta',
+            'datapoints': [
+                [0, 1578614400000],
+            ]
+        }
+    ]
+
+
+def test_covid19api_uncached():
+    stub = CovidPGConnectorStub(test_data + [(datetime(2020, 1, 9, 12), 'US', '', 4, 0, 0)])
+    covid19api = Covid19API(cache=False)
+    covid19api.set_covidpg(stub)
+    assert covid19api.get_data([('confirmed', ''), ('confirmed-delta', '')],
+                               start_time='2020-01-06T00:00:00.000Z', end_time='2020-01-09T00:00:00.000Z') == [
+        {
+            'target': 'confirmed',
+            'datapoints': [
+                [4, 1578355200000],
+                [22, 1578528000000],
+            ]
+        },
+        {
+            'target': 'confirmed-delta',
+            'datapoints': [
+                [1, 1578355200000],
+                [18, 1578528000000],
+            ]
+        }
+    ]
+    # carry-in for BE & US, US on 01/07 and BE, ML & US on 01/09
+    assert stub.fetched == 6
+    assert covid19api.series.watermark is None
+
+
+def test_covid19api_engines():
+    data = test_data + [
+        (datetime(2020, 1, 9, 12), 'US', '', 4, 1, 0),
+        (datetime(2020, 1, 12), 'BE', '', 12, 2, 3),
+        (datetime(2020, 1, 12, 6), 'ML', '', 10, 0, 2),
+    ]
+    targets = [(target, '') for target in Covid19API().targets]
+    python = Covid19API(engine='python')
+    python.set_covidpg(CovidPGConnectorStub(data[:6]))
+    numpy = Covid19API(engine='numpy')
+    numpy.set_covidpg(CovidPGConnectorStub(data[:6]))
+    assert numpy.get_data(targets) == python.get_data(targets)
+    python.covid19pg.data = numpy.covid19pg.data = data
+    for start_time, end_time in [
+        (None, None),
+        ('2020-01-05T00:00:00.000Z', None),
+        ('2020-01-06T00:00:00.000Z', '2020-01-09T00:00:00.000Z'),
+        ('2020-01-13T00:00:00.000Z', None),
+    ]:
+        expected = python.get_data(targets, start_time, end_time)
+        assert numpy.get_data(targets, start_time, end_time) == expected
+    assert python.get_data([('active', '')])[0]['datapoints'][-1] == [18, 1578787200000]
+    assert Covid19API(cache=False, engine='numpy').engine == 'numpy'
+
+
+def test_covid19api_downsample():
+    for engine in ['python', 'numpy']:
+        covid19api = Covid19API(engine=engine)
+        covid19api.set_covidpg(CovidPGConnectorStub(test_data))
+        assert covid19api.get_data([('confirmed', ''), ('confirmed-delta', '')], max_data_points=2) == [
+            {
+                'target': 'confirmed',
+                'datapoints': [
+                    [3, 1578182400000],
+                    [20, 1578528000000],
+                ]
+            },
+            {
+                'target': 'confirmed-delta',
+                'datapoints': [
+                    [3, 1578182400000],
+                    [17, 1578528000000],
+                ]
+            }
+        ]
+        assert covid19api.get_data([('confirmed-delta', '')], interval=3 * 86400000) == [
+            {
+                'target': 'confirmed-delta',
+                'datapoints': [
+                    [1, 1577836800000],
+                    [2, 1578182400000],
+                    [17, 1578528000000],
+                ]
+            }
+        ]
+        assert covid19api.get_data([('confirmed', '')], max_data_points=100, interval=60000) == \
+            covid19api.get_data([('confirmed', '')])
+
+
+def test_covid19api_countries():
+    for engine in ['python', 'numpy']:
+        covid19api = Covid19API(engine=engine)
+        covid19api.set_covidpg(CovidPGConnectorStub(test_data))
+        assert 'confirmed:region=EU' in covid19api.targets
+        assert covid19api.get_data([('confirmed:BE', ''), ('active-delta:US', '')]) == [
+            {
+                'target': 'confirmed:BE',
+                'datapoints': [
+                    [0, 1577836800000],
+                    [2, 1578182400000],
+                    [2, 1578355200000],
+                    [9, 1578528000000],
+                ]
+            },
+            {
+                'target': 'active-delta:US',
+                'datapoints': [
+                    [1, 1577836800000],
+                    [0, 1578182400000],
+                    [1, 1578355200000],
+                    [0, 1578528000000],
+                ]
+            }
+        ]
+        assert covid19api.get_data([('death:region=EU', ''), ('confirmed-delta:region=Benelux', '')],
+                                   start_time='2020-01-07T00:00:00.000Z') == [
+            {
+                'target': 'death:region=EU',
+                'datapoints': [
+                    [0, 1578355200000],
+                    [0, 1578528000000],
+                ]
+            },
+            {
+                'target': 'confirmed-delta:region=Benelux',
+                'datapoints': [
+                    [0, 1578355200000],
+                    [7, 1578528000000],
+                ]
+            }
+        ]
+        assert covid19api.get_data([('confirmed:region=Mars', ''), ('foo:BE', '')]) == []
@@ -0,0 +1,24 @@
+import gzip
+import json
+from covid19.apiserver.encoder import encode, compress, collect
+
+metrics = [
+    {'target': 'confirmed', 'datapoints': [[1, 1577836800000], [3.5, 1578182400000], [4, 1578355200000]]},
+    {'target': 'death', 'datapoints': []},
+    {'target': 'active:region=EU', 'datapoints': [[value, value * 1000] for value in range(10)]},
+]
+
+
+def test_encode():
+    assert b''.join(encode(metrics, chunk_size=2)).decode() == json.dumps(metrics)
+    assert b''.join(encode([])).decode() == json.dumps([])
+    streamed = [{'target': 'confirmed', 'datapoints': (datapoint for datapoint in metrics[2]['datapoints'])}]
+    assert b''.join(encode(streamed, chunk_size=3)).decode() == \
+        json.dumps([{'target': 'confirmed', 'datapoints': metrics[2]['datapoints']}])
+
+
+def test_compress():
+    collected = []
+    body = b''.join(collect(compress(encode(metrics)), collected.append))
+    assert gzip.decompress(body).decode() == json.dumps(metrics)
+    assert collected == [body]
@@ -22,21 +22,33 @@ def test_print_config():
     args = '--once --apikey 4321 --postgres-host foobar --postgres-port 5432 --postgres-database snafu'.split()
     config = get_configuration(args)
     output = print_configuration(config)
-    assert output == 'interval=1200, port=8080, debug=False, once=True, apikey=****, postgres_host=foobar, ' \
+    assert output == 'interval=1200, port=8080, debug=False, once=True, concurrent=False, apikey=****, ' \
+                     'connect_timeout=5, read_timeout=30, postgres_host=foobar, ' \
                      'postgres_port=5432, postgres_database=snafu, postgres_user=None, ' \
-                     'postgres_password=None, pushgateway=None'
+                     'postgres_password=None, postgres_pool_size=5, postgres_partitioned=False, ' \
+                     'pushgateway=None'
 
 
 def test_redacted_config():
     args = '--postgres-user foo --postgres-password bar'.split()
     config = get_configuration(args)
     output = print_configuration(config)
-    assert output == 'interval=1200, port=8080, debug=False, once=False, apikey=None, ' \
+    assert output == 'interval=1200, port=8080, debug=False, once=False, concurrent=False, apikey=None, ' \
+                     'connect_timeout=5, read_timeout=30, ' \
                      'postgres_host=None, postgres_port=5432, postgres_database=covid19, postgres_user=foo, ' \
-                     'postgres_password=************, pushgateway=None'
+                     'postgres_password=************, postgres_pool_size=5, postgres_partitioned=False, ' \
+                     'pushgateway=None'
     args = '--apikey 12345678901234567890123456789012'.split()
     config = get_configuration(args)
     output = print_configuration(config)
-    assert output == 'interval=1200, port=8080, debug=False, once=False, apikey=********************************, ' \
+    assert output == 'interval=1200, port=8080, debug=False, once=False, concurrent=False, ' \
+                     'apikey=********************************, connect_timeout=5, read_timeout=30, ' \
                      'postgres_host=None, postgres_port=5432, postgres_database=covid19, postgres_user=None, ' \
-                     'postgres_password=None, pushgateway=None'
+                     'postgres_password=None, postgres_pool_size=5, postgres_partitioned=False, ' \
+                     'pushgateway=None'
+
+
+def test_timeout_config():
+    config = get_configuration('--connect-timeout 2.5 --read-timeout 10'.split())
+    assert config.connect_timeout == 2.5
+    assert config.read_timeout == 10
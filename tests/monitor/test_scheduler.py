@@ -0,0 +1,64 @@
+import time
+import threading
+from pimetrics.probe import Probe
+from covid19.monitor.scheduler import ConcurrentScheduler, PROBE_OVERRUNS, PROBE_SKIPPED
+
+
+class SleepProbe(Probe):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.runs = 0
+        self.running = 0
+        self.overlapped = False
+        self._lock = threading.Lock()
+
+    def measure(self):
+        with self._lock:
+            self.running += 1
+            self.overlapped |= self.running > 1
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+            self.runs += 1
+        return self.runs
+
+
+class FastProbe(SleepProbe):
+    pass
+
+
+class FailingProbe(Probe):
+    def measure(self):
+        raise ValueError('failed')
+
+
+def test_once():
+    scheduler = ConcurrentScheduler()
+    probes = [FastProbe(0.2), FastProbe(0.2), FastProbe(0.2)]
+    for probe in probes:
+        scheduler.register(probe, 10)
+    scheduler.register(FailingProbe(), 10)
+    start = time.time()
+    scheduler.run(once=True)
+    # probes ran concurrently
+    assert time.time() - start < 0.5
+    assert [probe.measured() for probe in probes] == [1, 1, 1]
+
+
+def test_overrun():
+    scheduler = ConcurrentScheduler()
+    slow, fast = SleepProbe(0.5), FastProbe(0)
+    scheduler.register(slow, 0.2)
+    scheduler.register(fast, 0.1)
+    overruns = PROBE_OVERRUNS.labels('SleepProbe')._value.get()
+    skipped = PROBE_SKIPPED.labels('SleepProbe')._value.get()
+    scheduler.run(duration=1.2)
+    # the slow probe doesn't hold up the fast one
+    assert fast.runs >= 8
+    # ... and never overlaps with itself
+    assert slow.overlapped is False
+    assert slow.runs >= 2
+    assert PROBE_OVERRUNS.labels('SleepProbe')._value.get() > overruns
+    assert PROBE_SKIPPED.labels('SleepProbe')._value.get() > skipped
+    assert PROBE_OVERRUNS.labels('FastProbe')._value.get() == 0
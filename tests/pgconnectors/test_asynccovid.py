@@ -0,0 +1,44 @@
+import asyncio
+import datetime
+from covid19.pgconnectors.asynccovid import AsyncCovidPGConnector
+from tests.pgconnectors.test_covid import get_dbenv, get_connector
+
+
+def test_asyncpgconnector():
+    connector = get_connector()
+    connector._drop_db()
+    for day, confirmed in [(1, 3), (2, 6), (3, 9)]:
+        connector.addmany({
+            'Belgium': {
+                'code': 'BE',
+                'confirmed': confirmed,
+                'deaths': 2,
+                'recovered': 1,
+                'time': datetime.datetime(2020, 11, day)
+            }
+        })
+
+    async def run():
+        host, port, database, user, password = get_dbenv()
+        asyncconnector = AsyncCovidPGConnector(host, port, database, user, password)
+        try:
+            assert await asyncconnector.list() == connector.list()
+            assert await asyncconnector.list(start_time='2020-11-01') == connector.list(start_time='2020-11-01')
+            rows = connector.list()
+            assert await asyncconnector.list(start_time=rows[0][0]) == rows[1:]
+            assert await asyncconnector.list_daily() == connector.list_daily()
+            assert await asyncconnector.list_daily('2020-11-03', '2020-11-03') == \
+                connector.list_daily('2020-11-03', '2020-11-03')
+            assert await asyncconnector.list_rollup() == connector.list_rollup()
+            assert await asyncconnector.list_rollup('2020-11-02', '2020-11-03') == \
+                connector.list_rollup('2020-11-02', '2020-11-03')
+            assert await asyncconnector.list_rollup(since=rows[0][0]) == connector.list_rollup(since=rows[0][0])
+            assert await asyncconnector.list_totals() == connector.list_totals()
+            assert await asyncconnector.list_totals('2020-11-02', '2020-11-02') == \
+                connector.list_totals('2020-11-02', '2020-11-02')
+            assert await asyncconnector.list_totals(since=rows[1][0]) == connector.list_totals(since=rows[1][0])
+            assert await asyncconnector.get_latest_time() == connector.get_latest_time()
+        finally:
+            await asyncconnector.close()
+
+    asyncio.run(run())
@@ -5,6 +5,7 @@ import psycopg2
 import psycopg2.errors
 import pytest
 from covid19.pgconnectors.covid import CovidPGConnector
+from covid19.apiserver.covid19api import Covid19API
 
 
 def get_dbenv():
@@ -30,6 +31,7 @@ def test_pgconnector():
         cur = conn.cursor()
         cur.execute("DELETE FROM covid19")
         conn.commit()
+    connector.release(conn)
     connector.addmany({
         'Belgium': {
             'code': 'BE',
@@ -74,6 +76,31 @@ def test_pgconnector():
     assert rows[0][3] == 3
     assert rows[0][4] == 2
     assert rows[0][5] == 1
+    rows = connector.list(start_time='2020-11-01')
+    assert len(rows) == 1
+    assert rows[0][3] == 6
+    connector.addmany({
+        'Belgium': {
+            'code': 'BE',
+            'confirmed': 7,
+            'deaths': 4,
+            'recovered': 2,
+            'time': datetime.datetime(2020, 11, 2, 12)
+        }
+    })
+    rows = connector.list_daily()
+    assert len(rows) == 2
+    assert rows[0][3] == 3
+    assert rows[1][3] == 7
+    rows = connector.list_daily('2020-11-02', '2020-11-02')
+    assert len(rows) == 2
+    assert rows[0][3] == 3
+    assert rows[1][3] == 7
+    rows = connector.list_daily(end_time='2020-11-01')
+    assert len(rows) == 1
+    assert rows[0][3] == 3
+    entry = connector.get_latest_time()
+    assert entry == pytz.UTC.localize(datetime.datetime(2020, 11, 2, 12))
     entry = connector.get_first('Belgium')
     assert entry.strftime('%Y-%m-%d') == '2020-11-01'
     entry = connector.get_first('Not a country')
@@ -83,4 +110,189 @@ def test_pgconnector():
     last_updated = connector2.get_last_updated()
     assert len(last_updated.keys()) == 1
     assert 'Belgium' in last_updated
+    assert last_updated['Belgium'] == pytz.UTC.localize(datetime.datetime(2020, 11, 2, 12))
+
+
+def test_addmany_stream():
+    connector = get_connector()
+    connector._drop_db()
+    assert connector.addmany((
+        (country, {
+            'code': code,
+            'confirmed': day,
+            'deaths': None,
+            'recovered': 0,
+            'time': datetime.datetime(2020, 11, day)
+        })
+        for day in range(1, 11)
+        for country, code in [('Belgium', 'BE'), ('Cote d\'Ivoire', 'CI'), ('Korea, South', 'KR')]
+    ), batch_size=7) == 30
+    rows = connector.list()
+    assert len(rows) == 30
+    assert rows[-1][2] == 'Korea, South'
+    assert rows[-1][3] == 10
+    assert rows[-1][4] is None
+    assert len(connector.get_last_updated()) == 3
+    assert connector.addmany({}) == 0
+    assert len(connector.list()) == 30
+
+
+def test_last_updated():
+    connector = get_connector()
+    connector._drop_db()
+    connector._init_db()
+    assert connector.get_last_updated() == {}
+    connector.addmany({
+        'Belgium': {'code': 'BE', 'confirmed': 3, 'deaths': 2, 'recovered': 1,
+                    'time': datetime.datetime(2020, 11, 2)},
+        'France': {'code': 'FR', 'confirmed': 3, 'deaths': 2, 'recovered': 1,
+                   'time': datetime.datetime(2020, 11, 1)}
+    })
+    last_updated = connector.get_last_updated()
     assert last_updated['Belgium'] == pytz.UTC.localize(datetime.datetime(2020, 11, 2))
+    assert last_updated['France'] == pytz.UTC.localize(datetime.datetime(2020, 11, 1))
+    # older records don't move the watermark back
+    connector.addmany({
+        'Belgium': {'code': 'BE', 'confirmed': 1, 'deaths': 0, 'recovered': 0,
+                    'time': datetime.datetime(2020, 10, 30)}
+    })
+    assert connector.get_last_updated()['Belgium'] == pytz.UTC.localize(datetime.datetime(2020, 11, 2))
+    connector2 = get_connector()
+    assert connector2.get_last_updated() == last_updated
+    # covid19_latest is rebuilt from covid19 if it's missing
+    conn = connector.connect()
+    cur = conn.cursor()
+    cur.execute("DROP TABLE covid19_latest")
+    conn.commit()
+    connector.release(conn)
+    connector3 = get_connector()
+    assert connector3.get_last_updated() == last_updated
+
+
+def test_partitioned():
+    host, port, database, user, password = get_dbenv()
+    connector = get_connector()
+    connector._drop_db()
+    connector.addmany({
+        'Belgium': {'code': 'BE', 'confirmed': 3, 'deaths': 2, 'recovered': 1,
+                    'time': datetime.datetime(2020, 10, 31)},
+        'France': {'code': 'FR', 'confirmed': 4, 'deaths': 2, 'recovered': 1,
+                   'time': datetime.datetime(2020, 11, 1)}
+    })
+    # existing data is migrated into monthly partitions
+    connector = CovidPGConnector(host, port, database, user, password, partitioned=True)
+    assert connector.addmany({
+        'Belgium': {'code': 'BE', 'confirmed': 5, 'deaths': 2, 'recovered': 1,
+                    'time': datetime.datetime(2020, 12, 1)}
+    }, batch_size=1) == 1
+    conn = connector.connect()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'covid19'::regclass ORDER BY child.relname
+    """)
+    assert [entry[0] for entry in cur.fetchall()] == ['covid19_y2020m10', 'covid19_y2020m11', 'covid19_y2020m12']
+    connector.release(conn)
+    rows = connector.list()
+    assert [(row[2], row[3]) for row in rows] == [('Belgium', 3), ('France', 4), ('Belgium', 5)]
+    assert len(connector.list_daily('2020-11-01', '2020-11-30')) == 2
+    assert connector.get_first('Belgium').strftime('%Y-%m-%d') == '2020-10-31'
+    assert connector.get_last_updated()['Belgium'] == pytz.UTC.localize(datetime.datetime(2020, 12, 1))
+    connector._drop_db()
+
+
+def test_rollup():
+    connector = get_connector()
+    connector._drop_db()
+    for country, code, confirmed, time in [
+        ('Belgium', 'BE', 1, datetime.datetime(2020, 11, 1, 12)),
+        ('France', 'FR', 10, datetime.datetime(2020, 11, 1, 12)),
+        ('Belgium', 'BE', 2, datetime.datetime(2020, 11, 2, 12)),
+        ('Belgium', 'BE', 3, datetime.datetime(2020, 11, 2, 18)),
+        ('France', 'FR', 20, datetime.datetime(2020, 11, 3, 12)),
+        # late record for an earlier day
+        ('France', 'FR', 15, datetime.datetime(2020, 11, 2, 12)),
+    ]:
+        connector.addmany({country: {'code': code, 'confirmed': confirmed, 'deaths': 0, 'recovered': 1,
+                                     'time': time}})
+    assert [(row[0].day, row[1]) for row in connector.list_totals()] == [(1, 11), (2, 18), (3, 23)]
+    assert [(row[0].day, row[1]) for row in connector.list_totals('2020-11-03', '2020-11-03')] == [(2, 18), (3, 23)]
+    assert [(row[0].day, row[1]) for row in connector.list_totals(since=datetime.datetime(2020, 11, 2, 18))] == \
+        [(2, 18), (3, 23)]
+    rows = connector.list_rollup()
+    assert [(row[1], row[3]) for row in rows] == [('BE', 1), ('FR', 10), ('FR', 15), ('BE', 3), ('FR', 20)]
+    rows = connector.list_rollup('2020-11-03', '2020-11-03')
+    assert [(row[1], row[3]) for row in rows] == [('FR', 15), ('BE', 3), ('FR', 20)]
+    rows = connector.list_rollup(since=datetime.datetime(2020, 11, 2, 12))
+    assert [(row[1], row[3]) for row in rows] == [('BE', 3), ('FR', 20)]
+    # the rollup is built from existing data when it's missing
+    conn = connector.connect()
+    cur = conn.cursor()
+    cur.execute("DROP TABLE covid19_daily; DROP TABLE covid19_daily_totals")
+    conn.commit()
+    connector.release(conn)
+    connector2 = get_connector()
+    connector2._init_db()
+    assert [(row[0].day, row[1]) for row in connector2.list_totals()] == [(1, 11), (2, 18), (3, 23)]
+    # the API server gives the same answers from the rollup as from the raw records
+    targets = [('confirmed', ''), ('confirmed-delta', ''), ('active:BE', ''), ('confirmed-delta:region=Benelux', '')]
+    expected = None
+    for cache in [True, False]:
+        for engine in ['python', 'rollup']:
+            covid19api = Covid19API(cache=cache, engine=engine)
+            covid19api.set_covidpg(connector)
+            for start_time, end_time in [(None, None), ('2020-11-02T00:00:00.000Z', '2020-11-03T00:00:00.000Z')]:
+                output = covid19api.get_data(targets, start_time, end_time)
+                if expected is None or (start_time, end_time) not in expected:
+                    expected = expected or dict()
+                    expected[(start_time, end_time)] = output
+                assert output == expected[(start_time, end_time)]
+
+
+def test_upsert():
+    connector = get_connector()
+    connector._drop_db()
+    record = {'Belgium': {'code': 'BE', 'confirmed': 3, 'deaths': 2, 'recovered': 1,
+                          'time': datetime.datetime(2020, 11, 1)}}
+    assert connector.addmany(record) == 1
+    # same record again: nothing to do
+    assert connector.addmany(record) == 0
+    # corrected values are updated in place
+    record['Belgium']['confirmed'] = 4
+    assert connector.addmany(list(record.items()) * 2) == 1
+    rows = connector.list()
+    assert len(rows) == 1
+    assert rows[0][3] == 4
+    assert connector.list_totals()[0][1] == 4
+
+
+def test_compact():
+    connector = get_connector()
+    connector._drop_db()
+    conn = connector.connect()
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE covid19 (
+        time TIMESTAMPTZ, country_code TEXT, country_name TEXT,
+        confirmed DOUBLE PRECISION, death DOUBLE PRECISION, recovered DOUBLE PRECISION
+        );
+        INSERT INTO covid19 VALUES
+            ('2020-11-01', 'BE', 'Belgium', 1, 0, 0),
+            ('2020-11-01', 'BE', 'Belgium', 1, 0, 0),
+            ('2020-11-02', 'BE', 'Belgium', 2, 0, 0),
+            ('2020-11-01', 'FR', 'France', 3, 0, 0),
+            ('2020-11-01', 'FR', 'France', 3, 0, 0),
+            ('2020-11-01', 'FR', 'France', 3, 0, 0)
+    """)
+    conn.commit()
+    connector.release(conn)
+    connector = get_connector()
+    connector._init_db()
+    assert connector.unique is False
+    assert connector.compact() == 3
+    assert connector.unique is True
+    assert len(connector.list()) == 3
+    assert connector.addmany({'France': {'code': 'FR', 'confirmed': 3, 'deaths': 0, 'recovered': 0,
+                                         'time': pytz.UTC.localize(datetime.datetime(2020, 11, 1))}}) == 0
+    assert connector.compact(full=True) == 0
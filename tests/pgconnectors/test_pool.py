@@ -0,0 +1,31 @@
+import threading
+import time
+from covid19.pgconnectors.pgconnector import ConnectionPool, POOL_WAITS
+from tests.pgconnectors.test_covid import get_dbenv
+
+
+def test_pool():
+    host, port, database, user, password = get_dbenv()
+    pool = ConnectionPool(host, port, database, user, password, size=1)
+    conn = pool.getconn()
+    cur = conn.cursor()
+    cur.execute('SELECT 1')
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    waits = POOL_WAITS.labels(database)._value.get()
+    fetched = []
+    waiter = threading.Thread(target=lambda: fetched.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.1)
+    assert not fetched
+    pool.putconn(conn)
+    waiter.join(timeout=5)
+    assert fetched == [conn]
+    assert POOL_WAITS.labels(database)._value.get() == waits + 1
+    conn.close()
+    pool.putconn(conn)
+    conn = pool.getconn()
+    assert not conn.closed
+    pool.putconn(conn)
+    pool.closeall()
+    assert conn.closed
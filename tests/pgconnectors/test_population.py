@@ -41,3 +41,4 @@ def test_pgconnector():
         cur = conn.cursor()
         cur.execute("DELETE FROM population")
         conn.commit()
+    connector.release(conn)
@@ -1,6 +1,6 @@
 import datetime
 from pimetrics.stubs import APIStub
-from covid19.probes.covid import CovidCountryProbe, CovidLastUpdateProbe
+from covid19.probes.covid import CovidCountryProbe, CovidLastUpdateProbe, STATS_SKIPPED
 
 testfiles = {
     '/v1/stats': {
@@ -13,9 +13,9 @@ testfiles = {
 
 
 class CovidCountryTestProbe(APIStub, CovidCountryProbe):
-    def __init__(self):
+    def __init__(self, dbconnector=None, last_update=None):
         APIStub.__init__(self, testfiles)
-        CovidCountryProbe.__init__(self, None)
+        CovidCountryProbe.__init__(self, None, dbconnector, last_update=last_update)
 
 
 class CovidLastUpdateTestProbe(APIStub, CovidLastUpdateProbe):
@@ -39,6 +39,42 @@ def test_covidstats():
     assert '???' not in measured
 
 
+class CovidPGConnectorStub:
+    def __init__(self):
+        self.fail = False
+        self.added = 0
+
+    def get_last_updated(self):
+        return {}
+
+    def addmany(self, records):
+        if self.fail:
+            return None
+        self.added += len(records)
+        return len(records)
+
+
+def test_covidstats_gated():
+    dbconnector = CovidPGConnectorStub()
+    covid = CovidCountryTestProbe(dbconnector, last_update=CovidLastUpdateTestProbe())
+    skipped = STATS_SKIPPED._value.get()
+    dbconnector.fail = True
+    covid.run()
+    assert covid.measured()
+    assert dbconnector.added == 0
+    # previous ingest failed: fetch again
+    dbconnector.fail = False
+    covid.run()
+    assert dbconnector.added > 0
+    added = dbconnector.added
+    assert STATS_SKIPPED._value.get() == skipped
+    # lastReported didn't change
+    covid.run()
+    assert covid.measured() is None
+    assert dbconnector.added == added
+    assert STATS_SKIPPED._value.get() == skipped + 1
+
+
 # def test_bad_covidstats():
 #   covid = CovidCountryTestProbe()
 #   covid.success = False
@@ -0,0 +1,50 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from covid19.probes.http import HTTPProbe, REQUEST_TIME, RESPONSE_SIZE
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    ports = set()
+
+    def do_GET(self):
+        Handler.ports.add(self.client_address[1])
+        body = json.dumps({'path': self.path}).encode()
+        compressed = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compressed:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestProbe(HTTPProbe):
+    def measure(self):
+        return self.call('/test')
+
+
+def test_http_probe():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f'http://127.0.0.1:{server.server_port}'
+        probe = TestProbe(url)
+        for _ in range(3):
+            probe.run()
+            assert probe.measured() == {'path': '/test'}
+        # all calls went over the same (kept alive) connection
+        assert len(Handler.ports) == 1
+        assert REQUEST_TIME.labels(url, '/test')._count.get() == 3
+        assert RESPONSE_SIZE.labels(url, '/test')._sum.get() == 3 * len('{"path": "/test"}')
+    finally:
+        server.shutdown()
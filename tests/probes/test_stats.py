@@ -0,0 +1,33 @@
+import datetime
+import pytz
+from covid19.probes.stats import StatsParser, parse_time
+
+entries = [
+    {'country': 'Belgium', 'lastUpdate': '2020-09-03T04:28:22+00:00', 'confirmed': 1, 'deaths': 2, 'recovered': None},
+    {'country': 'Belgium', 'lastUpdate': '2020-09-03T04:28:22+00:00', 'confirmed': 3, 'deaths': None, 'recovered': 4},
+    {'country': 'France', 'lastUpdate': '2020-09-02T04:28:22+00:00', 'confirmed': 5, 'deaths': 0, 'recovered': 0},
+    {'country': '???', 'lastUpdate': '2020-09-02T04:28:22+00:00', 'confirmed': 5, 'deaths': 0, 'recovered': 0},
+]
+
+
+def test_parse_time():
+    assert parse_time('2020-09-03T04:28:22+00:00') == datetime.datetime(2020, 9, 3, 4, 28, 22)
+    assert parse_time('2020-9-3T04:28:22+00:00') == datetime.datetime(2020, 9, 3, 4, 28, 22)
+
+
+def test_aggregate():
+    parser = StatsParser()
+    output = parser.aggregate(entries)
+    assert output == {
+        'Belgium': {'code': 'BE', 'confirmed': 4, 'deaths': 2, 'recovered': 4,
+                    'time': datetime.datetime(2020, 9, 3, 4, 28, 22)},
+        'France': {'code': 'FR', 'confirmed': 5, 'deaths': 0, 'recovered': 0,
+                   'time': datetime.datetime(2020, 9, 2, 4, 28, 22)},
+    }
+    assert parser.unknown == {'???'}
+    assert len(parser._times) == 2
+    output = parser.aggregate(entries, {
+        'Belgium': pytz.UTC.localize(datetime.datetime(2020, 9, 2, 4, 28, 22)),
+        'France': pytz.UTC.localize(datetime.datetime(2020, 9, 2, 4, 28, 22))
+    })
+    assert list(output.keys()) == ['Belgium']
@@ -1,9 +1,14 @@
 import os
+import json
 import time
+import random
 import datetime
+import threading
 import requests
 import logging
 import pytz
+from concurrent.futures import ThreadPoolExecutor
+from covid19.probes import http
 from covid19.probes.countries import country_codes
 from covid19.pgconnectors.covid import CovidPGConnector
 
@@ -47,11 +52,65 @@ country_mapping = {
 }
 
 
+class BackfillError(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` calls per second on average, with bursts of up to `capacity` calls.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Checkpoint:
+    """
+    Records which countries have been backfilled, so an interrupted run can resume where it left off.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self.completed = set()
+        if filename and os.path.exists(filename):
+            with open(filename) as f:
+                self.completed = set(json.load(f))
+
+    def done(self, slug):
+        with self._lock:
+            self.completed.add(slug)
+            if self.filename:
+                with open(f'{self.filename}.tmp', 'w') as f:
+                    json.dump(sorted(self.completed), f)
+                os.replace(f'{self.filename}.tmp', self.filename)
+
+
 class HistoricalData:
-    def __init__(self, pgconnector):
+    def __init__(self, pgconnector, workers=4, rate=2, checkpoint=None, batch_size=500):
         self.url = 'https://api.covid19api.com'
-        self.countries = self._get_countries()
+        self.limiter = TokenBucket(rate, capacity=workers)
         self.slowdown = 5
+        self.max_slowdown = 120
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint)
+        self.countries = self._get_countries()
         self.pgconnector = pgconnector
 
     @staticmethod
@@ -62,28 +121,34 @@ class HistoricalData:
         else:
             return None, None
 
-    def _call(self, endpoint):
+    def _call(self, endpoint, label=None):
         url = f'{self.url}/{endpoint}'
+        slowdown = self.slowdown
         while True:
+            self.limiter.acquire()
             try:
-                response = requests.get(url)
+                response = http.request('GET', self.url, f'/{endpoint}', label)
                 if response.status_code == 200:
                     logging.debug(response.content)
                     return response.json()
                 elif response.status_code == 429:
-                    logging.debug(f'{response.reason}. Sleeping for {self.slowdown} second(s)')
-                    time.sleep(self.slowdown)
+                    # back off exponentially (with jitter), unless the server tells us how long to wait
+                    retry_after = response.headers.get('Retry-After', '')
+                    delay = int(retry_after) if retry_after.isdigit() else slowdown * random.uniform(1, 1.5)  # nosec
+                    logging.debug(f'{response.reason}. Sleeping for {delay:.1f} second(s)')
+                    time.sleep(delay)
+                    slowdown = min(slowdown * 2, self.max_slowdown)
                 else:
                     logging.error(f'Failed to get data: {response.status_code} - {response.reason}')
                     break
-            except requests.exceptions.ConnectionError as e:
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                 logging.warning(f'Failed to connect to {url}: {e}')
                 break
         return None
 
     def _get_countries(self):
         countries = dict()
-        for country in self._call('countries'):
+        for country in self._call('countries') or []:
             countries[country['Slug']] = {
                 'code': country['ISO2'],
                 'country': country['Country'],
@@ -93,35 +158,67 @@ class HistoricalData:
     def get_country(self, slug):
         return self.countries[slug]['country'] if slug in self.countries else None
 
-    def get_historical_data(self, countries=None):
-        if countries is None:
-            countries = self.countries.keys()
-        output = dict()
-        for slug in countries:
-            country = self.get_country(slug)
-            country, code = self.map_country(country)
-            last_date = self.pgconnector.get_first(country)
-            logging.info(f'Processing {country}')
-            for entry in self._call(f'total/country/{slug}'):
-                timestamp = pytz.UTC.localize(datetime.datetime.strptime(entry['Date'], '%Y-%m-%dT%H:%M:%SZ'))
-                if last_date is not None and timestamp >= last_date:
-                    continue
-                if timestamp not in output:
-                    output[timestamp] = dict()
-                output[timestamp][country] = {
-                    'time': timestamp,
-                    'code': code,
-                    'confirmed': entry['Confirmed'],
-                    'deaths': entry['Deaths'],
-                    'recovered': entry['Recovered'],
-                }
-        return output
+    def get_historical_data(self, slug):
+        # generator: yields the (country, record) pairs to add for one country, newest first.
+        # Writing newest first means an interrupted country resumes correctly: get_first() then returns
+        # the oldest record written so far and only older records are fetched again.
+        country, code = self.map_country(self.get_country(slug))
+        if country is None:
+            logging.warning(f'Could not find country code for "{self.get_country(slug)}". Skipping ...')
+            return
+        last_date = self.pgconnector.get_first(country)
+        logging.info(f'Processing {country}')
+        entries = self._call(f'total/country/{slug}', '/total/country')
+        if entries is None:
+            raise BackfillError(f'Failed to get historical data for {country}')
+        for entry in reversed(entries):
+            timestamp = pytz.UTC.localize(datetime.datetime.strptime(entry['Date'], '%Y-%m-%dT%H:%M:%SZ'))
+            if last_date is not None and timestamp >= last_date:
+                continue
+            yield country, {
+                'time': timestamp,
+                'code': code,
+                'confirmed': entry['Confirmed'],
+                'deaths': entry['Deaths'],
+                'recovered': entry['Recovered'],
+            }
+
+    @staticmethod
+    def batches(records, size):
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def backfill_country(self, slug):
+        count = 0
+        try:
+            for batch in self.batches(self.get_historical_data(slug), self.batch_size):
+                if self.pgconnector.addmany(batch) is None:
+                    raise BackfillError(f'Failed to store historical data for {batch[0][0]}')
+                count += len(batch)
+        except BackfillError as error:
+            logging.error(f'{error}. Will retry on the next run')
+            return
+        logging.info(f'{self.get_country(slug)}: {count} records added')
+        self.checkpoint.done(slug)
 
     def backfill(self, countries=None):
-        data = self.get_historical_data(countries)
-        for timestamp, values in data.items():
-            logging.info(f'Processing {timestamp}')
-            self.pgconnector.addmany(values)
+        if countries is None:
+            countries = self.countries.keys()
+        countries = [slug for slug in countries if slug not in self.checkpoint.completed]
+        logging.info(f'Backfilling {len(countries)} countries')
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {slug: executor.submit(self.backfill_country, slug) for slug in countries}
+            for slug, future in futures.items():
+                try:
+                    future.result()
+                except Exception as error:
+                    logging.error(f'Failed to backfill {slug}: {error}')
 
 
 if __name__ == '__main__':
@@ -133,5 +230,5 @@ if __name__ == '__main__':
         user='cicd',
         password=os.getenv('COVID_PASSWORD')
     )
-    server = HistoricalData(covid)
+    server = HistoricalData(covid, checkpoint=os.getenv('BACKFILL_CHECKPOINT', 'backfill.json'))
     server.backfill()
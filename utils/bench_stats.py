@@ -0,0 +1,55 @@
+import sys
+import json
+import timeit
+import logging
+from datetime import datetime
+import pytz
+from covid19.probes.countries import country_codes
+from covid19.probes.stats import StatsParser
+
+# Compares the /v1/stats aggregation of CovidCountryProbe before and after StatsParser.
+# Usage: python -m utils.bench_stats [stats.json]   (defaults to the test payload)
+
+
+def aggregate_before(entries, last_updated=None):
+    def nonetozero(val):
+        return val if val is not None else 0
+    output = {}
+    bad_countries = []
+    for entry in entries:
+        country = entry['country']
+        if country not in country_codes:
+            if country not in bad_countries:
+                bad_countries.append(country)
+            continue
+        update = pytz.UTC.localize(datetime.strptime(entry['lastUpdate'], '%Y-%m-%dT%H:%M:%S+00:00'))
+        if last_updated and country in last_updated.keys() and update <= last_updated[country]:
+            continue
+        if country not in output:
+            output[country] = {
+                'code': country_codes[country],
+                'confirmed': 0,
+                'deaths': 0,
+                'recovered': 0
+            }
+        output[country]['confirmed'] += nonetozero(entry['confirmed'])
+        output[country]['deaths'] += nonetozero(entry['deaths'])
+        output[country]['recovered'] += nonetozero(entry['recovered'])
+        output[country]['time'] = datetime.strptime(entry['lastUpdate'], '%Y-%m-%dT%H:%M:%S+00:00')
+    return output
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.ERROR)
+    with open(sys.argv[1] if len(sys.argv) > 1 else 'tests/data/covid_countries.json') as f:
+        entries = json.load(f)['data']['covid19Stats']
+    last_updated = {
+        country: pytz.UTC.localize(datetime(2020, 9, 1)) for country in country_codes
+    }
+    parser = StatsParser()
+    for label, updated in [('no watermark', None), ('watermark', last_updated)]:
+        assert parser.aggregate(entries, updated) == aggregate_before(entries, updated)
+        before = min(timeit.repeat(lambda: aggregate_before(entries, updated), number=10, repeat=5)) / 10
+        after = min(timeit.repeat(lambda: StatsParser().aggregate(entries, updated), number=10, repeat=5)) / 10
+        print(f'{len(entries)} entries, {label}: before {before * 1000:.2f} ms, '
+              f'after {after * 1000:.2f} ms ({before / after:.1f}x)')
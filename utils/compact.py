@@ -0,0 +1,31 @@
+import os
+import argparse
+import logging
+from covid19.pgconnectors.covid import CovidPGConnector
+
+# One-shot cleanup of a covid19 table created before records were keyed on (country_code, time):
+# removes the duplicates left by re-running backfill.py, --once or retried probes, then adds the key.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--postgres-host', default=os.getenv('POSTGRES_HOST'),
+                        help='Postgres DB host')
+    parser.add_argument('--postgres-port', default=os.getenv('POSTGRES_PORT', '5432'),
+                        help='Postgres DB port')
+    parser.add_argument('--postgres-database', default=os.getenv('POSTGRES_DB', 'covid19'),
+                        help='Postgres DB database name')
+    parser.add_argument('--postgres-user', default=os.getenv('POSTGRES_USER'),
+                        help='Postgres DB user name')
+    parser.add_argument('--full', action='store_true',
+                        help='Rewrite the table to give the freed space back to the OS (locks the table)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    covid = CovidPGConnector(
+        host=args.postgres_host,
+        port=args.postgres_port,
+        database=args.postgres_database,
+        user=args.postgres_user,
+        password=os.getenv('POSTGRES_PASSWORD')
+    )
+    if covid.compact(full=args.full) is None:
+        exit(1)